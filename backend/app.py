@@ -1,31 +1,72 @@
+import os
 from flask import Flask
 from flask_cors import CORS
-from extensions import db
+from extensions import db, apply_sqlite_pragmas
+from config import configs, engine_options
+from commands import register_commands
+from services.schema import upgrade_schema
+from services.badges import init_badge_catalog
+from services.llm import preload_sdk
+from services.logs import configure_logging
+from services.metrics import init_metrics
+from services.security import check_security_config
 
 # Import blueprints after db is initialized
 from routes import auth, data
 from routes.goals import goals_bp
 from routes.rewards import rewards_bp
+from routes.export import export_bp
+from routes.metrics import metrics_bp
 
-app = Flask(__name__)
-CORS(app)
 
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Optional, suppresses warning
-app.config['SECRET_KEY'] = 'your-secret-key'
+def create_app(config_name=None, **overrides):
+    """Build the app for APP_ENV (or `config_name`); keyword overrides win over the config class."""
+    app = Flask(__name__)
+    CORS(app)
 
-# Initialize extensions
-db.init_app(app)
+    # Configuration
+    app.config.from_object(configs[config_name or os.environ.get('APP_ENV', 'development')])
+    app.config.update(overrides)
+    app.config.setdefault('RECOMMENDATION_CACHE_PATH', os.path.join(app.instance_path, 'cache.sqlite3'))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
 
-# Register Blueprints
-app.register_blueprint(auth.auth_bp)
-app.register_blueprint(data.data_bp)
-app.register_blueprint(goals_bp)
-app.register_blueprint(rewards_bp)
+    configure_logging(app)
+    check_security_config(app)
 
-# Create tables and run app
+    if app.config['LLM_PRELOAD']:
+        preload_sdk()
+
+    # Initialize extensions
+    db.init_app(app)
+    apply_sqlite_pragmas(app)
+    init_metrics(app)
+
+    # Badge definitions are seeded and cached once per process
+    with app.app_context():
+        init_badge_catalog()
+
+    # Register Blueprints
+    app.register_blueprint(auth.auth_bp)
+    app.register_blueprint(data.data_bp)
+    app.register_blueprint(goals_bp)
+    app.register_blueprint(rewards_bp)
+    app.register_blueprint(export_bp)
+    app.register_blueprint(metrics_bp)
+
+    # CLI maintenance commands (flask --app app <command>)
+    register_commands(app)
+    return app
+
+
+# No app is built at import time, so importing create_app (benchmarks,
+# scripts) never opens the default database. The flask CLI finds
+# create_app on its own (flask --app app ...); WSGI servers call it,
+# e.g. gunicorn 'app:create_app()'.
+
+# Create/migrate tables and run app
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.create_all()
-    app.run(debug=True)
+        upgrade_schema()
+        init_badge_catalog()
+    app.run(debug=app.config['DEBUG'], threaded=True)
@@ -0,0 +1,109 @@
+"""Throughput benchmark for the bulk DailyData ingest path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bulk_ingest --rows 1000000 --users 1000
+
+Loads the rows into a throwaway SQLite file twice (fresh insert, then a full
+overwrite so every row takes the update branch) and compares against the
+one-row-per-commit pattern used by POST /data/add on a small sample.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+
+from extensions import db
+from models import User, DailyData
+from services.ingest import bulk_upsert, parse_record
+from services.emissions import calculate_emissions
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed_users(count):
+    db.session.execute(db.insert(User), [
+        dict(username=f'bench{i}@example.com', password='x', full_name=f'Bench {i}',
+             location_type='urban', household_size=1, baseline_footprint=12.5)
+        for i in range(count)
+    ])
+    db.session.commit()
+    return [uid for (uid,) in db.session.query(User.id)]
+
+
+def generate(user_ids, rows, seed):
+    rng = random.Random(seed)
+    days = -(-rows // len(user_ids))
+    start = date(2020, 1, 1)
+    n = 0
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        for uid in user_ids:
+            if n == rows:
+                return
+            yield parse_record({
+                'user_id': uid,
+                'date': day,
+                'travel': rng.uniform(0, 50),
+                'food': rng.uniform(0, 5),
+                'waste': rng.uniform(0, 3),
+                'electricity': rng.uniform(0, 10),
+            })
+            n += 1
+
+
+def timed(label, rows, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {rows:>10} rows {elapsed:>9.2f}s {rows / elapsed:>12,.0f} rows/s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--single-sample', type=int, default=2000,
+                        help='rows to insert one commit at a time for comparison')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.sqlite3'))
+        with app.app_context():
+            db.create_all()
+            user_ids = seed_users(args.users)
+
+            timed('bulk insert', args.rows, lambda: bulk_upsert(
+                generate(user_ids, args.rows, 1), chunk_size=args.chunk_size))
+            timed('bulk overwrite (upsert)', args.rows, lambda: bulk_upsert(
+                generate(user_ids, args.rows, 2), chunk_size=args.chunk_size))
+
+            def single():
+                # Mirrors add_data: existence check, then one commit per row
+                start = date(1990, 1, 1)
+                for i in range(args.single_sample):
+                    uid = user_ids[i % len(user_ids)]
+                    day = start + timedelta(days=i // len(user_ids))
+                    if DailyData.query.filter_by(user_id=uid, date=day).first():
+                        continue
+                    db.session.add(DailyData(user_id=uid, date=day, **calculate_emissions(
+                        {'travel': 1, 'food': 1, 'waste': 1, 'electricity': 1})))
+                    db.session.commit()
+
+            timed('single row per commit', args.single_sample, single)
+
+
+if __name__ == '__main__':
+    main()
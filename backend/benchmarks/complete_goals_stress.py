@@ -0,0 +1,155 @@
+"""Concurrency stress test for complete_goal: points must be awarded exactly once.
+
+Run from the backend directory:
+
+    python -m benchmarks.complete_goals_stress --workers 4 --threads 8 --users 20 --goals 25
+
+Seeds a fresh SQLite file (or --database-url), then has every thread in
+every worker process PATCH every goal, so each goal is completed by
+`workers * threads` racing requests, plus one PATCH per goal with the
+wrong user id. Afterwards each user's totalPoints and goals_completed must
+equal the sum and count of their goals, and the points reported as awarded
+across all responses must match as well. Exits non-zero on any mismatch.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+
+from sqlalchemy import func
+
+from app import create_app
+from extensions import db
+from models import User, Goal
+
+
+def build_app(url):
+    return create_app('production', SQLALCHEMY_DATABASE_URI=url, LLM_PROVIDER='stub', SECRET_KEY='bench',
+                      AUTH_REQUIRED=False)
+
+
+def seed(url, users, goals_per_user):
+    app = build_app(url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            dict(username=f'race{i}@example.com', password='x', full_name=f'Race {i}',
+                 location_type='urban', household_size=1, baseline_footprint=12.5,
+                 totalPoints=0, goals_completed=0)
+            for i in range(users)
+        ])
+        user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+        rng = random.Random(0)
+        db.session.execute(db.insert(Goal), [
+            dict(user_id=uid, title=f'Race goal {n}', category='food', points=rng.randint(10, 30))
+            for uid in user_ids for n in range(goals_per_user)
+        ])
+        db.session.commit()
+        pairs = db.session.query(Goal.user_id, Goal.id).all()
+        db.engine.dispose()
+    return [tuple(p) for p in pairs], max(user_ids) + 1
+
+
+def run_worker(args):
+    url, threads, pairs, stranger, seed_value = args
+    app = build_app(url)
+    result = {'awarded': 0, 'completed': 0, 'repeat': 0, 'not_found': 0, 'error': 0}
+    lock = threading.Lock()
+
+    def work(n):
+        client = app.test_client()
+        order = list(pairs)
+        random.Random(seed_value * 1000 + n).shuffle(order)
+        for user_id, goal_id in order:
+            res = client.patch(f'/goals/complete/{user_id}/{goal_id}')
+            body = res.get_json() or {}
+            with lock:
+                if res.status_code != 200:
+                    result['error'] += 1
+                elif 'awarded_points' in body:
+                    result['completed'] += 1
+                    result['awarded'] += body['awarded_points']
+                else:
+                    result['repeat'] += 1
+        # Someone else's goal must never be completed
+        for user_id, goal_id in order[:len(order) // threads + 1]:
+            res = client.patch(f'/goals/complete/{stranger}/{goal_id}')
+            with lock:
+                result['not_found' if res.status_code == 404 else 'error'] += 1
+
+    pool = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    with app.app_context():
+        db.engine.dispose()
+    return result
+
+
+def verify(url):
+    app = build_app(url)
+    with app.app_context():
+        expected = dict(
+            (uid, (points, count)) for uid, points, count in db.session.query(
+                Goal.user_id, func.sum(Goal.points), func.count(Goal.id)
+            ).filter(Goal.completed.is_(True)).group_by(Goal.user_id)
+        )
+        open_goals = db.session.query(func.count(Goal.id)).filter(Goal.completed.is_(False)).scalar()
+        mismatches = [
+            (u.id, (u.totalPoints, u.goals_completed), expected.get(u.id, (0, 0)))
+            for u in User.query.all()
+            if (u.totalPoints, u.goals_completed) != expected.get(u.id, (0, 0))
+        ]
+        total_points = db.session.query(func.sum(User.totalPoints)).scalar() or 0
+        db.engine.dispose()
+    return mismatches, open_goals, total_points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--goals', type=int, default=25, help='goals per user')
+    parser.add_argument('--database-url', help='use this database instead of a temp SQLite file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'stress.sqlite3')}"
+        pairs, stranger = seed(url, args.users, args.goals)
+        jobs = [(url, args.threads, pairs, stranger, w) for w in range(args.workers)]
+        start = time.perf_counter()
+        with Pool(args.workers) as pool:
+            results = pool.map(run_worker, jobs)
+        elapsed = time.perf_counter() - start
+        totals = {k: sum(r[k] for r in results) for k in results[0]}
+        mismatches, open_goals, total_points = verify(url)
+
+    requests = sum(totals[k] for k in ('completed', 'repeat', 'not_found', 'error'))
+    print(f"{requests} requests in {elapsed:.2f}s ({requests / elapsed:.1f}/s): "
+          f"{totals['completed']} completions, {totals['repeat']} already completed, "
+          f"{totals['not_found']} rejected for the wrong user, {totals['error']} errors")
+
+    problems = []
+    if totals['completed'] != len(pairs) or open_goals:
+        problems.append(f"{totals['completed']} completions for {len(pairs)} goals ({open_goals} left open)")
+    if totals['awarded'] != total_points:
+        problems.append(f"responses awarded {totals['awarded']} points, users hold {total_points}")
+    if totals['error']:
+        problems.append(f"{totals['error']} unexpected responses")
+    for user_id, got, want in mismatches[:10]:
+        problems.append(f"user {user_id}: (points, goals) {got} != {want}")
+    if problems:
+        print('FAILED\n  ' + '\n  '.join(problems))
+        sys.exit(1)
+    print(f'OK: {total_points} points awarded exactly once')
+
+
+if __name__ == '__main__':
+    main()
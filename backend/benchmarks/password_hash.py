@@ -0,0 +1,64 @@
+"""Time password hash methods to choose PASSWORD_HASH_METHOD for this hardware.
+
+Run from the backend directory, on the machine that will serve logins:
+
+    python -m benchmarks.password_hash --target-ms 250 --runs 5
+
+Each candidate is hashed `--runs` times; verifying costs the same as
+hashing. The slowest method still under --target-ms is suggested: every
+login (and signup) pays that much CPU per request, so multiply by the
+expected logins per second per worker before raising it further. Pass
+--method (repeatable) to time your own candidates instead.
+"""
+import argparse
+import statistics
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+CANDIDATES = (
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:300000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1',
+)
+
+
+def time_method(method, runs):
+    hashes, checks = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        stored = generate_password_hash('correct horse battery staple', method=method)
+        hashes.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        check_password_hash(stored, 'correct horse battery staple')
+        checks.append((time.perf_counter() - started) * 1000)
+    return statistics.median(hashes), statistics.median(checks), len(stored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', action='append', help='method to time (default: built-in candidates)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=250, help='most time a login may spend hashing')
+    args = parser.parse_args()
+
+    print(f"{'method':<24} {'hash':>9} {'verify':>9} {'length':>7} {'logins/s/core':>14}")
+    suggested = None
+    for method in args.method or CANDIDATES:
+        hash_ms, check_ms, length = time_method(method, args.runs)
+        print(f'{method:<24} {hash_ms:>7.1f}ms {check_ms:>7.1f}ms {length:>7} {1000 / check_ms:>14.1f}')
+        if check_ms <= args.target_ms and (suggested is None or check_ms > suggested[1]):
+            suggested = (method, check_ms)
+
+    if suggested:
+        print(f'\nPASSWORD_HASH_METHOD={suggested[0]}  ({suggested[1]:.1f}ms per login)')
+    else:
+        print(f'\nno candidate verifies within {args.target_ms:g}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Latency, query count and throughput for every route, on a synthetic population.
+
+Run from the backend directory:
+
+    python -m benchmarks.routes --users 10000 --days 365 --requests 200 \
+        --output results.json --compare previous.json
+
+Seeds a temporary SQLite file with benchmarks.synthetic (or reuses
+--database-url with --skip-seed), then sends `--requests` requests to each
+route through the Flask test client. Goals and recommendations come from
+the offline templates, or with `--advice llm` from the stub LLM standing
+in for Gemini. Read-only routes run first; write routes each get fresh users or
+goals so every request takes the same path. Per route it reports
+p50/p95/p99 latency, SQL statements per request and sequential
+throughput. `--output` writes the results as JSON. `--compare` reads an
+earlier results file and flags routes whose p95 grew past --threshold or
+that now run at least one more SQL statement per request, and
+`--fail-on-regression` makes that exit non-zero.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+from models import User, Goal
+from services.badges import init_badge_catalog
+from services.jobs import job_queue
+from services.security import issue_token
+from benchmarks.synthetic import populate, PASSWORD
+
+
+def build_app(url, advice='offline'):
+    return create_app(
+        'testing', SQLALCHEMY_DATABASE_URI=url, LLM_PROVIDER='stub', ADVICE_ENGINE=advice,
+        GOAL_GENERATION_ASYNC=False, JOB_RATE_PER_MINUTE=0, ADMIN_TOKEN='bench', LOG_LEVEL='WARNING'
+    )
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def scenarios(n, rng):
+    """(blueprint, name, [(method, path, json body[, headers]), ...]) for every route.
+
+    Users, goals and days are sampled here, before anything runs, so write
+    routes never hit the same row twice.
+    """
+    user_ids = [uid for (uid,) in db.session.query(User.id)]
+    usernames = dict(db.session.query(User.id, User.username))
+    open_goals = db.session.query(Goal.user_id, Goal.id).filter(Goal.completed.is_(False)).all()
+    today = datetime.utcnow().date()
+    rng.shuffle(user_ids)
+    pools = iter(range(len(user_ids)))
+
+    def pick():
+        # A fresh slice of users per route while they last, so writes don't overlap
+        start = next(pools, 0) * n % len(user_ids)
+        return [user_ids[(start + i) % len(user_ids)] for i in range(n)]
+
+    reads = pick()
+    # Finished jobs to poll; the status route only reads the in-memory queue
+    jobs = [(u, job_queue().submit(list, owner=u)) for u in reads]
+    return [
+        ('auth', 'login', [('post', '/auth/login', {'username': usernames[u], 'password': PASSWORD})
+                           for u in reads]),
+        ('auth', 'me', [('get', f'/auth/me?user_id={u}', None) for u in reads]),
+        ('auth', 'me (bearer token)', [('get', '/auth/me', None, {'Authorization': f'Bearer {issue_token(u)}'})
+                                       for u in reads]),
+        ('data', 'chart weekly (legacy)', [('get', f'/data/chart/{u}/weekly', None) for u in reads]),
+        ('data', 'chart monthly (legacy)', [('get', f'/data/chart/{u}/monthly', None) for u in reads]),
+        ('data', 'chart series 1y by week', [
+            ('get', f'/data/chart/{u}?bucket=week&start={today - timedelta(days=365)}', None) for u in reads]),
+        ('data', 'chart series all by month', [
+            ('get', f'/data/chart/{u}?bucket=month&start=2000-01-01', None) for u in reads]),
+        ('data', 'peers', [('get', f'/data/peers/{u}', None) for u in reads]),
+        ('data', 'fact', [('get', '/data/fact', None) for _ in reads]),
+        ('data', 'recommendations', [('get', f'/data/recommendations/{u}', None) for u in pick()]),
+        ('data', 'recommendations stream', [('get', f'/data/recommendations/{u}/stream', None) for u in pick()]),
+        ('export', 'daily_data csv', [('get', f'/export/{u}/daily_data', None) for u in reads[:max(1, n // 10)]]),
+        # The whole table, so only a couple of passes
+        ('export', 'all goals ndjson', [('get', '/export/all/goals?format=ndjson', None, {'X-Admin-Token': 'bench'})
+                                        for _ in range(2)]),
+        ('goals', 'list', [('get', f'/goals/{u}', None) for u in reads]),
+        ('goals', 'job status', [('get', f'/generate_goals/jobs/{j}?user_id={u}', None) for u, j in jobs]),
+        ('metrics', 'metrics', [('get', '/metrics', None) for _ in reads]),
+        ('rewards', 'rewards', [('get', f'/rewards/{u}', None) for u in reads]),
+        ('rewards', 'leaderboard page', [('get', '/rewards/leaderboard?limit=20', None) for _ in reads]),
+        ('rewards', 'leaderboard with me', [('get', f'/rewards/leaderboard?user_id={u}', None) for u in reads]),
+        # Writes
+        ('auth', 'signup', [('post', '/auth/signup', {
+            'username': f'bench-{i}@example.com', 'password': PASSWORD, 'full_name': 'Bench',
+            'location_type': rng.choice(('urban', 'suburban', 'rural')), 'household_size': 2
+        }) for i in range(n)]),
+        ('data', 'add', [('post', f'/data/add/{u}', {
+            'travel': 12, 'food': 3, 'waste': 1, 'electricity': 5
+        }) for u in pick()]),
+        # A typical backfill: 10 users, 10 consecutive days each
+        ('data', 'bulk 100 records', [('post', '/data/bulk', [
+            {'user_id': u, 'date': (start - timedelta(days=d)).isoformat(),
+             'travel': 10, 'food': 2, 'waste': 1, 'electricity': 4}
+            for u in rng.sample(user_ids, 10) for d in range(10)
+        ], {'X-Admin-Token': 'bench'}) for start in [today - timedelta(days=rng.randint(1, 300)) for _ in range(max(1, n // 10))]]),
+        ('goals', 'add', [('post', f'/goals/{u}', {'title': 'Bench goal', 'category': 'food'})
+                          for u in reads]),
+        ('goals', 'complete', [('patch', f'/goals/complete/{u}/{g}', None)
+                               for u, g in rng.sample(open_goals, min(n, len(open_goals)))]),
+        ('goals', 'generate', [('post', f'/generate_goals/{u}?wait=1', None) for u in pick()]),
+    ]
+
+
+def run(app, n, seed):
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    results = {}
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        plan = scenarios(n, random.Random(seed))
+        db.session.remove()
+        client = app.test_client()
+        for blueprint, name, calls in plan:
+            latencies = []
+            statuses = {}
+            statements[0] = 0
+            started = time.perf_counter()
+            for method, path, body, *headers in calls:
+                t = time.perf_counter()
+                response = getattr(client, method)(path, json=body, headers=headers[0] if headers else None)
+                response.get_data()
+                latencies.append((time.perf_counter() - t) * 1000)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            key = f'{blueprint}: {name}'
+            results[key] = {
+                'requests': len(calls),
+                'statuses': statuses,
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'mean_ms': round(sum(latencies) / len(latencies), 3),
+                'queries_per_request': round(statements[0] / len(calls), 2),
+                'throughput_rps': round(len(calls) / elapsed, 1),
+            }
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return results
+
+
+def compare(current, previous, threshold):
+    """Print per-route changes against an earlier run; return the regressed routes."""
+    regressions = []
+    print(f"\n{'route':<40} {'p95 before':>11} {'p95 now':>9} {'change':>8} {'queries':>13}")
+    for key, now in current['routes'].items():
+        before = previous.get('routes', {}).get(key)
+        if before is None:
+            print(f'{key:<40} {"(new)":>11}')
+            continue
+        change = now['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+        queries = f"{before['queries_per_request']:g} -> {now['queries_per_request']:g}"
+        slower = change > threshold and now['p95_ms'] - before['p95_ms'] > 1
+        # Fractional changes come from the sampled mix; a whole extra statement doesn't
+        more_queries = now['queries_per_request'] - before['queries_per_request'] >= 1
+        flag = '  REGRESSION' if slower or more_queries else ''
+        print(f"{key:<40} {before['p95_ms']:>9.2f}ms {now['p95_ms']:>7.2f}ms {change:>+8.0%} {queries:>13}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--goals', type=int, default=10, help='goals per user')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--advice', choices=('offline', 'llm'), default='offline',
+                        help='goal/recommendation engine (llm uses the stub provider)')
+    parser.add_argument('--database-url', help='database to use instead of a temp SQLite file')
+    parser.add_argument('--skip-seed', action='store_true', help='reuse the data already in --database-url')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 growth counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}"
+        app = build_app(url, args.advice)
+        if not args.skip_seed:
+            with app.app_context():
+                db.drop_all()
+                db.create_all()
+                init_badge_catalog()
+                populate(args.users, args.days, args.goals, args.seed, log=lambda line: None)
+                db.session.remove()
+        routes = run(app, args.requests, args.seed)
+        with app.app_context():
+            db.engine.dispose()
+
+    current = {
+        'meta': {
+            'created': datetime.utcnow().isoformat(timespec='seconds'),
+            'users': args.users, 'days': args.days, 'goals_per_user': args.goals,
+            'requests_per_route': args.requests, 'seed': args.seed, 'advice': args.advice,
+            'database': 'custom' if args.database_url else 'sqlite temp file',
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+        },
+        'routes': routes,
+    }
+    print(f"{'route':<40} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'req/s':>8}  statuses")
+    for key, r in routes.items():
+        print(f"{key:<40} {r['p50_ms']:>6.2f}ms {r['p95_ms']:>6.2f}ms {r['p99_ms']:>6.2f}ms "
+              f"{r['queries_per_request']:>8g} {r['throughput_rps']:>8.1f}  "
+              f"{', '.join(f'{s}x{c}' for s, c in sorted(r['statuses'].items()))}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(f'{len(regressions)} route(s) regressed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Cold-start cost of importing the app: wall time and resident memory.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+Each run imports `app` and builds it with create_app() in a fresh
+interpreter (against an in-memory database), once with the default lazy
+SDK loading and once with LLM_PRELOAD=1, which imports the Gemini SDK at
+startup the way the blueprints used to.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+app.create_app()
+elapsed = time.perf_counter() - start
+heavy = [m for m in ('google.genai', 'cohere', 'dotenv', 'httpx', 'pydantic', 'numpy') if m in sys.modules]
+print(json.dumps({
+    'import_seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': len(sys.modules),
+    'heavy_modules': heavy,
+}))
+'''
+
+MODES = {
+    'lazy': {},
+    'preload': {'LLM_PRELOAD': '1'},
+}
+
+
+def probe(extra_env):
+    env = dict(os.environ, DATABASE_URL='sqlite://', **extra_env)
+    env['PYTHONPATH'] = os.getcwd() + os.pathsep + env.get('PYTHONPATH', '')
+    out = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, env in MODES.items():
+        runs = [probe(env) for _ in range(args.runs)]
+        results[mode] = {
+            'import_seconds_median': statistics.median(r['import_seconds'] for r in runs),
+            'max_rss_mb_median': statistics.median(r['max_rss_mb'] for r in runs),
+            'modules': runs[-1]['modules'],
+            'heavy_modules': runs[-1]['heavy_modules'],
+        }
+        r = results[mode]
+        print(f"{mode:<8} import {r['import_seconds_median']:.3f}s  rss {r['max_rss_mb_median']:.1f} MB  "
+              f"modules {r['modules']}  heavy {', '.join(r['heavy_modules']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Synthetic population generator for benchmarks.
+
+    python -m benchmarks.synthetic --database-url sqlite:////tmp/synthetic.sqlite3 \
+        --users 10000 --days 730 --goals 12
+
+Writes users, `--days` of DailyData per user ending yesterday, goals (about
+half completed, points and badges to match) and the derived tables
+(emission rollups, cohort histograms), directly with multi-row INSERTs.
+Everything is consistent with what the routes would have produced, so
+the database can be read and written by the app afterwards. The same
+seed gives the same data.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from extensions import db
+from models import User, DailyData, Goal, EmissionRollup, CohortBin
+from services.emissions import CATEGORIES, CURRENT_VERSION, factors
+from services.rollups import PERIODS, period_start
+from services.cohorts import cohort_key, bin_of, BIN_COUNT
+from services.badges import backfill_badge_progress, init_badge_catalog
+from services.security import hash_password
+from services.leaderboard import rebuild_points_tally
+
+LOCATIONS = ('urban', 'suburban', 'rural')
+GOAL_CATEGORIES = ('travel', 'food', 'waste', 'electricity')
+PASSWORD = 'password'
+
+# Typical activity per day: (mean, spread) for travel km, meals, kg waste, kWh
+ACTIVITY = {'travel': (25, 20), 'food': (2.5, 1), 'waste': (1.2, 0.8), 'electricity': (6, 3)}
+
+
+def _activity(rng, scale):
+    return {c: max(0.0, rng.gauss(mean * scale, spread * scale)) for c, (mean, spread) in ACTIVITY.items()}
+
+
+def populate(users=1000, days=365, goals_per_user=10, seed=0, batch_users=500, log=print):
+    """Fill the current app's (empty) database. Returns row counts."""
+    rng = random.Random(seed)
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days)
+    counts = {'users': 0, 'daily_data': 0, 'goals': 0, 'rollups': 0}
+    histograms = {}
+    started = time.perf_counter()
+    stored_password = hash_password(PASSWORD)  # one salt for everyone: hashing per user would dominate
+
+    for offset in range(0, users, batch_users):
+        n = min(batch_users, users - offset)
+        profiles = []
+        for i in range(offset, offset + n):
+            loc = rng.choice(LOCATIONS)
+            size = rng.choice((1, 1, 2, 2, 3, 4, 5))
+            profiles.append(dict(
+                username=f'user{i}@example.com', password=stored_password, full_name=f'User {i}',
+                location_type=loc, household_size=size, baseline_footprint=12.5 * size,
+                setup_complete=True, totalPoints=0, goals_completed=0
+            ))
+        db.session.execute(db.insert(User), profiles)
+        user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id.desc()).limit(n)][::-1]
+
+        daily, rollups, goals = [], {}, []
+        for uid, profile in zip(user_ids, profiles):
+            f = factors(profile['location_type'])
+            scale = rng.uniform(0.5, 1.6)
+            cohort = histograms.setdefault(
+                cohort_key(profile['location_type'], profile['household_size']), [0] * BIN_COUNT)
+            for d in range(days):
+                if rng.random() < 0.15:  # days nobody logged
+                    continue
+                day = first_day + timedelta(days=d)
+                activity = _activity(rng, scale)
+                row = {c: activity[c] * k for c, k in zip(CATEGORIES, f)}
+                daily.append(dict(row, user_id=uid, date=day, factor_version=CURRENT_VERSION))
+                cohort[bin_of(sum(row.values()))] += 1
+                for period in PERIODS:
+                    bucket = rollups.setdefault((uid, period, period_start(period, day)),
+                                                dict.fromkeys(CATEGORIES + ('entries',), 0))
+                    for c in CATEGORIES:
+                        bucket[c] += row[c]
+                    bucket['entries'] += 1
+
+            points = completed = 0
+            for g in range(goals_per_user):
+                done = rng.random() < 0.5
+                value = rng.randint(10, 30)
+                generated = datetime.combine(first_day, datetime.min.time()) + timedelta(
+                    days=rng.randint(0, max(days - 8, 0)))
+                goals.append(dict(
+                    user_id=uid, title=f'Goal {g}', description='Synthetic goal',
+                    category=rng.choice(GOAL_CATEGORIES), points=value, completed=done,
+                    date_completed=generated + timedelta(days=3) if done else None,
+                    generated_at=generated
+                ))
+                points += value if done else 0
+                completed += done
+            profile.update(id=uid, totalPoints=points, goals_completed=completed)
+
+        for chunk in range(0, len(daily), 50000):
+            db.session.execute(db.insert(DailyData), daily[chunk:chunk + 50000])
+        if rollups:
+            db.session.execute(db.insert(EmissionRollup), [
+                dict(bucket, user_id=uid, period=period, period_start=start)
+                for (uid, period, start), bucket in rollups.items()
+            ])
+        if goals:
+            db.session.execute(db.insert(Goal), goals)
+        db.session.execute(db.update(User), [
+            dict(id=p['id'], totalPoints=p['totalPoints'], goals_completed=p['goals_completed'])
+            for p in profiles
+        ])
+        db.session.commit()
+
+        counts['users'] += n
+        counts['daily_data'] += len(daily)
+        counts['goals'] += len(goals)
+        counts['rollups'] += len(rollups)
+        log(f"{counts['users']:>9} users {counts['daily_data']:>11} days "
+            f"{time.perf_counter() - started:>8.1f}s")
+
+    db.session.execute(db.insert(CohortBin), [
+        dict(location_type=loc, household_size=size, bin=b, count=count)
+        for (loc, size), hist in histograms.items() for b, count in enumerate(hist) if count
+    ])
+    backfill_badge_progress()
+    rebuild_points_tally()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--goals', type=int, default=10, help='goals per user')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app('production', SQLALCHEMY_DATABASE_URI=args.database_url, LLM_PROVIDER='stub',
+                     SECRET_KEY='bench')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        init_badge_catalog()
+        print(populate(args.users, args.days, args.goals, args.seed))
+
+
+if __name__ == '__main__':
+    main()
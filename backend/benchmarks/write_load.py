@@ -0,0 +1,147 @@
+"""Multi-process write load test for add_data and complete_goal.
+
+Run from the backend directory:
+
+    python -m benchmarks.write_load --workers 4 --threads 4 --ops 200
+
+Seeds a fresh SQLite file per mode, then starts `--workers` processes, each
+with its own app, engine and connection pool. Each one runs `--threads`
+threads that log a day of data and complete a goal for their own users.
+Mode "before" uses SQLite's defaults (rollback journal, no pragmas, no
+pool settings); "after" uses the production config. The two write-behind
+modes add WRITE_BEHIND with each acknowledgement setting; every mode
+checks afterwards that all of its entries and completions reached the
+database. Pass --database-url to run the "after" mode against another
+database, e.g. a local Postgres.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from config import ProductionConfig
+from extensions import db
+from models import User, Goal, DailyData
+
+MODES = {
+    'before': {'SQLITE_PRAGMAS': {}, 'SQLALCHEMY_ENGINE_OPTIONS': {}},
+    'after': {'SQLITE_PRAGMAS': ProductionConfig.SQLITE_PRAGMAS},
+    'write-behind': {'SQLITE_PRAGMAS': ProductionConfig.SQLITE_PRAGMAS,
+                     'WRITE_BEHIND': True, 'WRITE_BEHIND_ACK': 'flushed'},
+    'write-behind queued': {'SQLITE_PRAGMAS': ProductionConfig.SQLITE_PRAGMAS,
+                            'WRITE_BEHIND': True, 'WRITE_BEHIND_ACK': 'queued'},
+}
+
+
+def build_app(url, mode):
+    return create_app('production', SQLALCHEMY_DATABASE_URI=url, LLM_PROVIDER='stub',
+                      SECRET_KEY='bench', AUTH_REQUIRED=False,
+                      PROPAGATE_EXCEPTIONS=True, **MODES[mode])
+
+
+def seed(url, mode, users):
+    app = build_app(url, mode)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            dict(username=f'load{i}@example.com', password='x', full_name=f'Load {i}',
+                 location_type='urban', household_size=1, baseline_footprint=12.5,
+                 totalPoints=0, goals_completed=0)
+            for i in range(users)
+        ])
+        db.session.commit()
+        user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+        db.session.execute(db.insert(Goal), [
+            dict(user_id=uid, title='Load test goal', category='food', points=10) for uid in user_ids
+        ])
+        db.session.commit()
+        goals = dict(db.session.query(Goal.user_id, Goal.id))
+        db.engine.dispose()
+    return [(uid, goals[uid]) for uid in user_ids]
+
+
+def run_worker(args):
+    url, mode, threads, pairs = args
+    app = build_app(url, mode)
+    counts = {'ok': 0, 'locked': 0, 'error': 0}
+    lock = threading.Lock()
+
+    def work(chunk):
+        client = app.test_client()
+        for user_id, goal_id in chunk:
+            for method, path, body in (
+                ('post', f'/data/add/{user_id}', {'travel': 10, 'food': 1, 'waste': 1, 'electricity': 2}),
+                ('patch', f'/goals/complete/{user_id}/{goal_id}', None),
+            ):
+                try:
+                    status = getattr(client, method)(path, json=body).status_code
+                    key = 'ok' if status < 400 else 'error'
+                except OperationalError as e:
+                    key = 'locked' if 'locked' in str(e) else 'error'
+                with lock:
+                    counts[key] += 1
+
+    pool = [threading.Thread(target=work, args=(pairs[i::threads],)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    writer = app.extensions.get('write_behind')
+    if writer is not None:
+        writer.close()  # queued writes count only once they have committed
+    with app.app_context():
+        db.engine.dispose()
+    return counts
+
+
+def run_mode(url, mode, workers, threads, ops):
+    pairs = seed(url, mode, workers * ops)
+    jobs = [(url, mode, threads, pairs[i::workers]) for i in range(workers)]
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        results = pool.map(run_worker, jobs)
+    elapsed = time.perf_counter() - start
+    totals = {k: sum(r[k] for r in results) for k in ('ok', 'locked', 'error')}
+    totals['seconds'] = elapsed
+    totals['writes_per_second'] = totals['ok'] / elapsed
+    app = build_app(url, mode)
+    with app.app_context():
+        totals['stored'] = (db.session.query(DailyData.id).count()
+                            + db.session.query(Goal.id).filter(Goal.completed.is_(True)).count())
+        db.engine.dispose()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=200, help='users (one add + one completion each) per worker')
+    parser.add_argument('--database-url', help='run "after" against this URL instead of a temp SQLite file')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            url = f"sqlite:///{os.path.join(tmp, mode + '.sqlite3')}"
+            if mode == 'after' and args.database_url:
+                url = args.database_url
+            r = results[mode] = run_mode(url, mode, args.workers, args.threads, args.ops)
+            print(f"{mode:<20} {r['ok']:>6} ok {r['locked']:>5} locked {r['error']:>5} other errors "
+                  f"{r['seconds']:>7.2f}s {r['writes_per_second']:>8.1f} writes/s {r['stored']:>6} stored")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
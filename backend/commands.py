@@ -0,0 +1,85 @@
+import time
+import click
+from extensions import db
+from services.rollups import rebuild_rollups
+from services.schema import upgrade_schema
+from services.emissions import rederive_emissions, CURRENT_VERSION
+from services.cohorts import refresh_cohorts
+from services.query_audit import audit
+from services.goal_sweep import run_sweep
+
+
+def register_commands(app):
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Recompute the emission rollup table from DailyData."""
+        db.create_all()
+        count = rebuild_rollups()
+        click.echo(f'Rolled up {count} daily entries.')
+
+    @app.cli.command('rederive-emissions')
+    @click.option('--version', type=int, default=CURRENT_VERSION, show_default=True,
+                  help='Emission factor version to bring every row to.')
+    def rederive_emissions_command(version):
+        """Rescale stored emissions after an emission factor revision."""
+        count = rederive_emissions(version)
+        click.echo(f'Rescaled {count} daily entries to factor version {version}.')
+        if count:
+            click.echo(f'Rolled up {rebuild_rollups()} daily entries.')
+            click.echo(f'Rebuilt cohort histograms from {refresh_cohorts()[0]} daily entries.')
+
+    @app.cli.command('refresh-cohorts')
+    def refresh_cohorts_command():
+        """Rebuild cohort histograms and reset baselines to cohort medians (run periodically)."""
+        db.create_all()
+        days, users = refresh_cohorts()
+        click.echo(f'Counted {days} daily entries; updated {users} baselines.')
+
+    @app.cli.command('sweep-goals')
+    @click.option('--batch-size', type=int, default=None, help='Users per batch (default GOAL_SWEEP_BATCH_SIZE).')
+    @click.option('--restart', is_flag=True, help='Start over instead of resuming an unfinished sweep.')
+    @click.option('--every', type=float, default=None,
+                  help='Keep running, starting a sweep every this many hours.')
+    def sweep_goals_command(batch_size, restart, every):
+        """Generate goals for every user due a weekly refresh, in batches."""
+        db.create_all()
+        batch_size = batch_size or app.config['GOAL_SWEEP_BATCH_SIZE']
+
+        def progress(sweep):
+            click.echo(f'  through user {sweep.last_user_id}: {sweep.users} users, '
+                       f'{sweep.llm_calls} LLM calls, {sweep.goals} goals')
+
+        while True:
+            started = time.monotonic()
+            sweep = run_sweep(batch_size, restart, progress)
+            click.echo(f'Sweep {sweep.id}: gave {sweep.users} users {sweep.goals} goals with '
+                       f'{sweep.llm_calls} LLM calls; skipped {sweep.skipped}.')
+            if every is None:
+                break
+            restart = False
+            time.sleep(max(0, every * 3600 - (time.monotonic() - started)))
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Migrate an existing database file to the current schema."""
+        steps = upgrade_schema()
+        for step in steps:
+            click.echo(step)
+        click.echo('Database is up to date.' if not steps else f'{len(steps)} step(s) applied.')
+
+    @app.cli.command('explain-queries')
+    @click.option('--verbose', '-v', is_flag=True, help='Print every query plan.')
+    def explain_queries_command(verbose):
+        """Check that no hot-path query does a full table scan."""
+        if db.engine.dialect.name != 'sqlite':
+            raise SystemExit('explain-queries uses EXPLAIN QUERY PLAN and needs a SQLite database')
+        failures = 0
+        for blueprint, label, plan, scans in audit():
+            status = 'SCAN' if scans else 'ok'
+            click.echo(f'[{status:>4}] {blueprint}: {label}')
+            if verbose or scans:
+                for line in plan:
+                    click.echo(f'         {line}')
+            failures += bool(scans)
+        if failures:
+            raise SystemExit(f'{failures} query(ies) do a full table scan')
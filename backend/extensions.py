@@ -1,3 +1,78 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert, update, bindparam, and_
+from sqlalchemy.exc import OperationalError
+from functools import wraps
+import time
 
 db = SQLAlchemy()
+
+
+def apply_sqlite_pragmas(app):
+    """Run app.config['SQLITE_PRAGMAS'] on every new connection to a SQLite engine."""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def retry_on_locked(view, attempts=3, delay=0.05):
+    """Re-run a write view when SQLite reports the database as locked.
+
+    busy_timeout covers writers waiting on each other, but a WAL transaction
+    that read before writing fails immediately if another writer committed
+    in between (SQLITE_BUSY_SNAPSHOT). Starting over with a fresh snapshot
+    is safe for views that check their preconditions before writing.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        for attempt in range(attempts):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'database is locked' not in str(e) or attempt == attempts - 1:
+                    raise
+                time.sleep(delay * (attempt + 1))
+    return wrapper
+
+
+def increment_rows(model, key_columns, deltas, existing_stmt):
+    """Add counters into rows keyed on `key_columns`, creating the rows that are missing.
+
+    `deltas` maps key tuples to {column: amount}, the same columns for every
+    key. `existing_stmt` selects the key columns of the rows that may already
+    exist; it may return extra keys, so each caller can use whatever shape
+    its index seeks best. Missing rows go out as one multi-row INSERT and
+    existing ones are incremented in SQL with one executemany UPDATE, so
+    concurrent writers don't lose each other's changes. Does not commit.
+    """
+    if not deltas:
+        return
+    existing = {tuple(row) for row in db.session.execute(existing_stmt)}
+    to_insert = []
+    to_update = []
+    for key, amounts in deltas.items():
+        if key in existing:
+            to_update.append({**{f'k_{k}': v for k, v in zip(key_columns, key)},
+                              **{f'd_{c}': v for c, v in amounts.items()}})
+        else:
+            to_insert.append(dict(zip(key_columns, key), **amounts))
+    if to_insert:
+        db.session.execute(insert(model), to_insert)
+    if to_update:
+        table = model.__table__
+        columns = next(iter(deltas.values()))
+        db.session.connection().execute(
+            update(table)
+            .where(and_(*(table.c[k] == bindparam(f'k_{k}') for k in key_columns)))
+            .values({c: table.c[c] + bindparam(f'd_{c}') for c in columns}),
+            to_update
+        )
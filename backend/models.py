@@ -4,17 +4,29 @@ from datetime import datetime
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)  # email
-    password = db.Column(db.String(120), nullable=False)
+    password = db.Column(db.String(255), nullable=False)  # werkzeug hash; legacy rows plaintext until next login
     full_name = db.Column(db.String(120), nullable=False)
     location_type = db.Column(db.String(100), nullable=False)  # urban/suburban/rural
     household_size = db.Column(db.Integer, nullable=False)
     baseline_footprint = db.Column(db.Float, nullable=False)
     setup_complete = db.Column(db.Boolean, default=True)
     totalPoints = db.Column(db.Integer, default=0)
+    goals_completed = db.Column(db.Integer, default=0)  # kept in step with totalPoints for badge checks
 
     # Relationship
     daily_data = db.relationship('DailyData', backref='user', lazy=True)
 
+    __table_args__ = (
+        # Leaderboard order; top-N and rank lookups walk this index
+        db.Index('ix_user_points', 'totalPoints', 'id'),
+    )
+
+
+class PointsTally(db.Model):
+    """How many users hold each positive points total; leaderboard ranks are sums over it."""
+    points = db.Column(db.Integer, primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0)
+
 
 class DailyData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -24,6 +36,12 @@ class DailyData(db.Model):
     food = db.Column(db.Float)
     waste = db.Column(db.Float)
     electricity = db.Column(db.Float)
+    factor_version = db.Column(db.Integer, default=1)  # services.emissions table used for the values above
+
+    __table_args__ = (
+        # One entry per user per day; also serves every per-user date range lookup
+        db.Index('ix_daily_data_user_date', 'user_id', 'date', unique=True),
+    )
 
 
 class Goal(db.Model):
@@ -37,6 +55,11 @@ class Goal(db.Model):
     date_completed = db.Column(db.DateTime)
     generated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_goal_user_completed', 'user_id', 'completed'),
+        db.Index('ix_goal_user_generated', 'user_id', 'generated_at'),
+    )
+
 
 class Badge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -52,3 +75,49 @@ class UserBadge(db.Model):
 
     user = db.relationship('User', backref='user_badges')
     badge = db.relationship('Badge')
+
+    __table_args__ = (
+        db.Index('ix_user_badge_user_badge', 'user_id', 'badge_id', unique=True),
+    )
+
+
+class EmissionRollup(db.Model):
+    # Per-user totals per day/week/month bucket, kept current on every DailyData write
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period = db.Column(db.String(10), nullable=False)  # 'day', 'week' or 'month'
+    period_start = db.Column(db.Date, nullable=False)
+    travel = db.Column(db.Float, nullable=False, default=0)
+    food = db.Column(db.Float, nullable=False, default=0)
+    waste = db.Column(db.Float, nullable=False, default=0)
+    electricity = db.Column(db.Float, nullable=False, default=0)
+    entries = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period', 'period_start', name='uq_rollup_bucket'),
+    )
+
+
+class CohortBin(db.Model):
+    # One histogram bin of daily footprints for a (location_type, household_size) cohort
+    id = db.Column(db.Integer, primary_key=True)
+    location_type = db.Column(db.String(100), nullable=False)
+    household_size = db.Column(db.Integer, nullable=False)
+    bin = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('location_type', 'household_size', 'bin', name='uq_cohort_bin'),
+    )
+
+
+class GoalSweep(db.Model):
+    # Checkpoint of a batched weekly goal generation run (services.goal_sweep)
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    last_user_id = db.Column(db.Integer, nullable=False, default=0)  # users up to here are done
+    users = db.Column(db.Integer, nullable=False, default=0)  # users given goals
+    skipped = db.Column(db.Integer, nullable=False, default=0)  # due but no data or a failed call
+    llm_calls = db.Column(db.Integer, nullable=False, default=0)  # answered by the LLM, not the templates
+    goals = db.Column(db.Integer, nullable=False, default=0)
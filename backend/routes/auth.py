@@ -1,14 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, g
 from models import User
+from sqlalchemy import select
 from extensions import db
+from services.cohorts import cohort_baseline
+from services.security import (hash_password, verify_password, reject_unknown_user,
+                               issue_token, authenticate)
+from services.write_behind import read_your_writes
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 
+def user_by_username_stmt(username):
+    return select(User).where(User.username == username)
+
+
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     data = request.json
-    if User.query.filter_by(username=data['username']).first():
+    if db.session.scalars(user_by_username_stmt(data['username'])).first():
         return jsonify({'message': 'User already exists'}), 400
 
     base_footprints = {
@@ -19,11 +28,14 @@ def signup():
     location = data.get('location_type', '').lower()
     multiplier = base_footprints.get(location, 15.0)
     size = data.get('household_size', 1)
-    baseline = multiplier * size
+    # Real data from the user's cohort once there is enough of it
+    baseline = cohort_baseline(location, size)
+    if baseline is None:
+        baseline = multiplier * size
 
     user = User(
         username=data['username'],
-        password=data['password'],
+        password=hash_password(data['password']),
         full_name=data['full_name'],
         location_type=location,
         household_size=size,
@@ -33,24 +45,38 @@ def signup():
     )
     db.session.add(user)
     db.session.commit()
-    return jsonify({'message': 'User registered successfully'}), 201
+    return jsonify({
+        'message': 'User registered successfully', 'user_id': user.id,
+        'token': issue_token(user.id), 'expires_in': current_app.config['TOKEN_MAX_AGE']
+    }), 201
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.json
-    user = User.query.filter_by(username=data['username'], password=data['password']).first()
-    if user:
-        return jsonify({'message': 'Login successful', 'user_id': user.id}), 200
-    return jsonify({'message': 'Invalid credentials'}), 401
+    user = db.session.scalars(user_by_username_stmt(data['username'])).first()
+    ok, rehash = verify_password(user.password, data['password']) if user else (
+        reject_unknown_user(data['password']), False)
+    if not ok:
+        return jsonify({'message': 'Invalid credentials'}), 401
+    if rehash:
+        # Legacy plaintext or an older hash cost: upgrade now that we have the password
+        user.password = hash_password(data['password'])
+        db.session.commit()
+    return jsonify({
+        'message': 'Login successful', 'user_id': user.id,
+        'token': issue_token(user.id), 'expires_in': current_app.config['TOKEN_MAX_AGE']
+    }), 200
 
 @auth_bp.route('/me', methods=['GET'])
+@authenticate
+@read_your_writes
 def get_current_user():
-    user_id = request.args.get('user_id')
+    user_id = g.user_id
 
     if not user_id:
         return jsonify({'message': 'Missing user_id'}), 400
 
-    user = User.query.filter_by(id=user_id).first()
+    user = db.session.get(User, user_id)
 
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -0,0 +1,41 @@
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from services.export import EXPORTS, FORMATS, iter_batches, serialize, gzip_stream
+from services.security import authenticate, require_admin
+from services.write_behind import read_your_writes
+
+export_bp = Blueprint('export', __name__, url_prefix='/export')
+
+
+def _stream(kind, user_id, filename):
+    if kind not in EXPORTS:
+        return jsonify({'error': f"Unknown export {kind!r}; use one of {', '.join(EXPORTS)}"}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    body = serialize(kind, iter_batches(kind, user_id, batch_size), fmt)
+    headers = {
+        'Content-Disposition': f'attachment; filename={filename}.{fmt}',
+        'Vary': 'Accept-Encoding',
+    }
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    # Streamed as produced (chunked transfer); the session stays open until the last batch
+    return Response(stream_with_context(body), content_type=FORMATS[fmt], headers=headers)
+
+
+# One user's history: /export/<user_id>/<daily_data|goals|badges>?format=csv|ndjson
+@export_bp.route('/<int:user_id>/<string:kind>', methods=['GET'])
+@authenticate
+@read_your_writes
+def export_user(user_id, kind):
+    return _stream(kind, user_id, f'user-{user_id}-{kind}')
+
+
+# Every user's history; needs the X-Admin-Token header to match ADMIN_TOKEN
+@export_bp.route('/all/<string:kind>', methods=['GET'])
+@require_admin
+def export_all(kind):
+    return _stream(kind, None, f'all-{kind}')
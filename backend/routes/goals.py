@@ -1,76 +1,150 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app, url_for, g
 from models import Goal
-from extensions import db
+from extensions import db, retry_on_locked
 from datetime import datetime,timedelta
-from models import User,DailyData
-from sqlalchemy import desc
-from google import genai
-from google.genai import types
-import cohere
-import json
+from models import User
+from services.rollups import window_totals
+from services.badges import award_crossed
+from services.jobs import job_queue
+from services import goal_list, leaderboard
+from sqlalchemy import desc, func, update, select
+from services.goal_generation import suggest_goals, InvalidGoalResponse
+from services.offline_advice import offline_goals
+from services.logs import get_logger
+from services.security import authenticate
+from services.write_behind import write_behind, read_your_writes, DUPLICATE
 
 goals_bp = Blueprint('goals', __name__)
-co = cohere.Client("HCpjrF88IxJNE3kwA6lyOZYxapJ4qB6psPf2oeKA")
+log = get_logger('goals')
+
+def owned_goal_stmt(goal_id, user_id, *columns):
+    return select(*columns).where(Goal.id == goal_id, Goal.user_id == user_id)
+
+
+def latest_goal_stmt(user_id):
+    return select(Goal).where(Goal.user_id == user_id).order_by(desc(Goal.generated_at)).limit(1)
+
+
 def add_sample_goals(user_id):
-    from models import Goal
-    sample_goals = [
-        Goal(user_id=user_id, title="Use public transport for a week", category="transport", points=20),
-        Goal(user_id=user_id, title="Eat vegetarian meals 3 times a week", category="food", points=15),
-        Goal(user_id=user_id, title="Turn off unused lights", category="electricity", points=10),
-    ]
-    db.session.bulk_save_objects(sample_goals)
+    # Starter goals from the offline templates, fitted to whatever the user has logged
+    today = datetime.utcnow().date()
+    summary = window_totals(user_id, today - timedelta(days=14), today)
+    db.session.bulk_save_objects([Goal(user_id=user_id, **g) for g in offline_goals(summary)])
     db.session.commit()
 
-# Fetch all goals for a user
+# Fetch goals for a user. Without query parameters this is the original
+# unpaged list; any of limit/cursor/status/category/fields switches to
+# {goals, next_cursor} pages, newest first. Both honour If-None-Match.
 @goals_bp.route('/goals/<int:user_id>', methods=['GET'])
+@authenticate
+@read_your_writes
 def get_goals(user_id):
-    goals = Goal.query.filter_by(user_id=user_id).all()
-    goal_list = []
-    for g in goals:
-        goal_list.append({
-            'id': g.id,
-            'title': g.title,
-            'description': g.description,
-            'category': g.category,
-            'points': g.points,
-            'completed': g.completed,
-            'dateCompleted': g.date_completed.isoformat() if g.date_completed else None
-        })
-    return jsonify(goal_list), 200
+    args = request.args
+    etag = goal_list.fingerprint(user_id, request.query_string.decode())
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        paged = any(k in args for k in ('limit', 'cursor', 'status', 'category', 'fields'))
+        fields = tuple(f for f in args.get('fields', '').split(',') if f) or goal_list.LEGACY_FIELDS
+        unknown = [f for f in fields if f not in goal_list.FIELDS]
+        if unknown:
+            return jsonify({'message': f"Unknown field(s): {', '.join(unknown)}"}), 400
+        status = args.get('status')
+        if status and status not in goal_list.STATUSES:
+            return jsonify({'message': 'status must be completed or pending'}), 400
+
+        if not paged:
+            response = jsonify(goal_list.all_goals(user_id))
+        else:
+            limit = min(args.get('limit', goal_list.DEFAULT_PAGE_SIZE, type=int), goal_list.MAX_PAGE_SIZE)
+            if limit < 1:
+                return jsonify({'message': 'limit must be positive'}), 400
+            try:
+                goals, next_cursor = goal_list.page(
+                    user_id, limit=limit, cursor=args.get('cursor'), status=status,
+                    category=args.get('category'), fields=fields
+                )
+            except ValueError:
+                return jsonify({'message': 'Invalid cursor'}), 400
+            response = jsonify({'goals': goals, 'next_cursor': next_cursor})
+
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'  # cache, but revalidate every time
+    return response
 
 # Mark goal as complete
 @goals_bp.route('/goals/complete/<int:user_id>/<int:goal_id>', methods=['PATCH'])
+@authenticate
+@retry_on_locked
 def complete_goal(user_id, goal_id):
-    goal = Goal.query.get(goal_id)
-    if not goal:
-        return jsonify({'error': 'Goal not found'}), 404
-
-    if goal.completed:
+    writer = write_behind()
+    if writer is not None:
+        goal = db.session.execute(owned_goal_stmt(goal_id, user_id, Goal.points, Goal.completed)).first()
+        if goal is None:
+            return jsonify({'error': 'Goal not found'}), 404
+        write = DUPLICATE if goal.completed else writer.complete_goal(user_id, goal_id)
+        if write is DUPLICATE:
+            return jsonify({'message': 'Goal already completed'}), 200
+        if write is not None:
+            status = writer.acknowledge(write)
+            if status == 'failed':
+                return jsonify({'error': 'Could not complete goal'}), 500
+            if status == 'queued':
+                return jsonify({'message': 'Goal completion accepted', 'awarded_points': goal.points or 10}), 202
+            if write.result is None:
+                return jsonify({'message': 'Goal already completed'}), 200
+            return jsonify({
+                'message': 'Goal marked as complete',
+                'awarded_points': goal.points or 10,
+                'new_total_points': write.result
+            }), 200
+        # Queue full: complete it directly
+
+    # Flip the goal only if it is this user's and still open, so concurrent
+    # PATCHes for one goal award its points exactly once
+    claimed = db.session.execute(
+        update(Goal)
+        .where(Goal.id == goal_id, Goal.user_id == user_id, Goal.completed.is_(False))
+        .values(completed=True, date_completed=datetime.utcnow())
+        .returning(Goal.points)
+    ).first()
+    if claimed is None:
+        db.session.rollback()
+        if db.session.execute(owned_goal_stmt(goal_id, user_id, Goal.id)).first() is None:
+            return jsonify({'error': 'Goal not found'}), 404
         return jsonify({'message': 'Goal already completed'}), 200
 
-    user = User.query.get(user_id)
-    if not user:
+    # Award points (use goal.points if it exists, else default to 10), incremented in SQL
+    awarded_points = claimed.points or 10
+    totals = db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(totalPoints=func.coalesce(User.totalPoints, 0) + awarded_points,
+                goals_completed=func.coalesce(User.goals_completed, 0) + 1)
+        .returning(User.totalPoints, User.goals_completed)
+    ).first()
+    if totals is None:
+        db.session.rollback()
         return jsonify({'error': 'User not found'}), 404
 
-    # Update goal completion
-    goal.completed = True
-    goal.date_completed = datetime.utcnow()
-
-    # Award points (use goal.points if it exists, else default to 10)
-    awarded_points = getattr(goal, 'points', 10) or 10
-    user.totalPoints = user.totalPoints + awarded_points
-    print(user.totalPoints)
+    # Only the badge thresholds this completion crossed need checking
+    after = {'goals': totals.goals_completed, 'points': totals.totalPoints}
+    before = {'goals': after['goals'] - 1, 'points': after['points'] - awarded_points}
+    award_crossed(user_id, before, after)
+    leaderboard.record_points([(before['points'], after['points'])])
 
     db.session.commit()
 
     return jsonify({
         'message': 'Goal marked as complete',
         'awarded_points': awarded_points,
-        'new_total_points': user.totalPoints
+        'new_total_points': totals.totalPoints
     }), 200
 
 # Optional: Add a goal
 @goals_bp.route('/goals/<int:user_id>', methods=['POST'])
+@authenticate
+@retry_on_locked
 def add_goal(user_id):
     data = request.json
     goal = Goal(
@@ -84,98 +158,83 @@ def add_goal(user_id):
     db.session.commit()
     return jsonify({'message': 'Goal added'}), 201
 
+
+def create_goals(user_id, summary):
+    """Ask Gemini (or the offline templates) for goals matching a 14-day summary and save them.
+
+    Runs either inline or on the job queue; returns the saved goals. Each
+    goal is committed as soon as it parses, so a client polling the goal
+    list sees the first one before the model has finished the rest.
+    """
+    def save(goal):
+        db.session.add(Goal(user_id=user_id, **goal))
+        db.session.commit()
+
+    saved_goals, source = suggest_goals(summary, on_goal=save)
+    log.info('goals generated', extra={'fields': {
+        'user_id': user_id, 'count': len(saved_goals), 'source': source}})
+    return saved_goals
+
+
+# Generation runs on the background job queue and answers 202 with a job id
+# to poll; pass ?wait=1 (or set GOAL_GENERATION_ASYNC = False) to block instead.
 @goals_bp.route('/generate_goals/<int:user_id>', methods=['POST'])
+@authenticate
+@read_your_writes
 def generate_goals(user_id):
-    latest_goal = Goal.query.filter_by(user_id=user_id).order_by(desc(Goal.generated_at)).first()
+    latest_goal = db.session.scalars(latest_goal_stmt(user_id)).first()
     if latest_goal and (datetime.utcnow() - latest_goal.generated_at).days < 7:
         return jsonify({'message': 'Goals already generated recently'}), 200
 
-    recent_data = DailyData.query.filter(
-        DailyData.user_id == user_id,
-        DailyData.date >= datetime.utcnow().date() - timedelta(days=14)
-    ).all()
+    today = datetime.utcnow().date()
+    totals = window_totals(user_id, today - timedelta(days=14), today)
 
-    if not recent_data:
+    if not totals['entries']:
         return jsonify({'message': 'Not enough data to generate goals'}), 400
 
     # Step 2: Summarize categories
     summary = {
-        'travel': sum(d.travel for d in recent_data),
-        'food': sum(d.food for d in recent_data),
-        'waste': sum(d.waste for d in recent_data),
-        'electricity': sum(d.electricity for d in recent_data),
+        'travel': totals['travel'],
+        'food': totals['food'],
+        'waste': totals['waste'],
+        'electricity': totals['electricity'],
+        'entries': totals['entries'],
     }
 
-    # Step 3: Prompt for Gemini
-    prompt = f"""
-You are an expert environmental assistant. A user has emitted the following carbon emissions in the last 14 days:
-- Travel: {summary['travel']} kg CO2
-- Food: {summary['food']} kg CO2
-- Waste: {summary['waste']} kg CO2
-- Electricity: {summary['electricity']} kg CO2
-
-Based on this data, suggest 3 to 5 personalized, actionable sustainability goals that can help reduce their carbon footprint.
-
-For each goal, provide:
-- title (string)
-- description (string)
-- category: one of ['travel', 'food', 'waste', 'electricity']
-- points (integer between 10 and 30)
-
-Return only a valid JSON array of objects in the following format:
-[
-  {{
-    "title": "...",
-    "description": "...",
-    "category": "...",
-    "points": 20
-  }}
-]
-No explanation or preamble. Only return the JSON.
-"""
+    # Step 3: Hand the Gemini call off to the job queue
+    if current_app.config.get('GOAL_GENERATION_ASYNC', True) and not request.args.get('wait', type=int):
+        job_id = job_queue().submit(create_goals, user_id, summary, dedupe_key=('generate_goals', user_id),
+                                    owner=user_id)
+        return jsonify({
+            'message': 'Goal generation queued',
+            'job_id': job_id,
+            # ?user_id= identifies the caller for clients that don't send a token
+            'status_url': url_for('goals.get_goal_job', job_id=job_id, user_id=user_id)
+        }), 202
 
     try:
-        client = genai.Client()
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.7,
-                top_p=1
-            )
-        )
-
-        # Gemini returns text inside `response.text` like Cohere
-        raw_text = response.text.strip()
-
-        # Try parsing as JSON
-        goals = json.loads(raw_text)
-        print(goals)
-        saved_goals = []
-        for g in goals:
-            goal = Goal(
-                user_id=user_id,
-                title=g['title'],
-                description=g.get('description', ''),
-                category=g.get('category', 'general'),
-                points=int(g.get('points', 10))
-            )
-            db.session.add(goal)
-            saved_goals.append({
-                'title': goal.title,
-                'description': goal.description,
-                'category': goal.category,
-                'points': goal.points
-            })
-
-        db.session.commit()
-        print(saved_goals)
+        saved_goals = create_goals(user_id, summary)
         return jsonify({
             'message': 'Goals generated and saved successfully',
             'goals': saved_goals
         }), 201
 
-    except json.JSONDecodeError:
-        return jsonify({'error': 'Response from Gemini was not valid JSON', 'raw': raw_text}), 500
+    except InvalidGoalResponse as e:
+        return jsonify({'error': str(e), 'raw': e.raw}), 500
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@goals_bp.route('/generate_goals/jobs/<string:job_id>', methods=['GET'])
+@authenticate
+def get_goal_job(job_id):
+    job = job_queue().get(job_id)
+    # Someone else's job answers the same as a missing one
+    if not job or job['owner'] != g.user_id:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],  # queued, running, done or failed
+        'goals': job['result'],
+        'error': job['error']
+    }), 200
@@ -0,0 +1,12 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+# Prometheus scrape target; figures are per process
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = current_app.extensions.get('metrics')
+    if metrics is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
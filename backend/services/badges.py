@@ -0,0 +1,170 @@
+from extensions import db
+from models import User, Goal, Badge, UserBadge
+from datetime import datetime
+from sqlalchemy import select, func, exists, and_, event, inspect
+from sqlalchemy.exc import IntegrityError
+import threading
+
+# Badge definitions with name, description, and icon. The key encodes what is
+# counted and the threshold: '<n>_goals', '<n>_points' or 'first_goal'.
+badge_defs = {
+    'first_goal': ('First Step', 'Complete your first goal', '👣'),
+    '5_goals': ('Starter', 'Complete 5 goals', '🚀'),
+    '10_goals': ('Goal Getter', 'Complete 10 goals', '🎯'),
+    '25_goals': ('Goal Chaser', 'Complete 25 goals', '🏃'),
+    '50_goals': ('Achiever', 'Complete 50 goals', '🏆'),
+    '100_goals': ('Legend', 'Complete 100 goals', '👑'),
+    '500_points': ('Rising Star', 'Earn 500 points', '⭐'),
+    '750_points': ('Almost There', 'Earn 750 points', '⏳'),
+    '1000_points': ('Point Master', 'Earn 1000 total points', '🏅'),
+    '2000_points': ('Elite Performer', 'Earn 2000 points', '🥇'),
+}
+
+
+def badge_rule(key):
+    """Return (counter, threshold) for a badge key, e.g. ('points', 500)."""
+    if key == 'first_goal':
+        return 'goals', 1
+    threshold, counter = key.split('_')
+    return counter, int(threshold)
+
+
+def seed_badges():
+    """Insert any badge_defs entry missing from the Badge table. Does not commit."""
+    existing = {name for (name,) in db.session.query(Badge.name)}
+    for name, description, icon in badge_defs.values():
+        if name not in existing:
+            db.session.add(Badge(name=name, description=description, icon=icon))
+    db.session.flush()
+
+
+def catalog_stmt():
+    return select(Badge).order_by(Badge.id)
+
+
+class BadgeCatalog:
+    """Process-wide, read-mostly copy of the Badge table.
+
+    Filled once at startup by `init_badge_catalog` and dropped whenever a
+    Badge row is inserted, updated or deleted through the ORM; the next
+    reader reloads it. Changes made by another process, or by raw SQL, need
+    `invalidate()` or a restart to show up here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.badges = []
+        self.by_id = {}
+        self.by_name = {}
+        self.rules = []
+
+    def load(self):
+        with self._lock:
+            badges = [
+                {'id': b.id, 'name': b.name, 'description': b.description, 'icon': b.icon}
+                for b in db.session.scalars(catalog_stmt())
+            ]
+            rules = []
+            for key, (name, _, _) in badge_defs.items():
+                counter, threshold = badge_rule(key)
+                rules.append((counter, threshold, name))
+
+            self.badges = badges
+            self.by_id = {b['id']: b for b in badges}
+            self.by_name = {b['name']: b for b in badges}
+            self.rules = sorted(rules)
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+        return self
+
+    def invalidate(self):
+        self._loaded = False
+
+    def crossed(self, before, after):
+        """Badges whose threshold lies in (before, after] for their counter."""
+        self.ensure_loaded()
+        return [
+            self.by_name[name] for counter, threshold, name in self.rules
+            if before[counter] < threshold <= after[counter] and name in self.by_name
+        ]
+
+
+catalog = BadgeCatalog()
+
+
+def init_badge_catalog():
+    """Seed the Badge table from badge_defs and load the catalog.
+
+    Skipped when the table doesn't exist yet (fresh database before
+    create_all/upgrade-db); the catalog then loads on first use.
+    """
+    if not inspect(db.engine).has_table(Badge.__tablename__):
+        return
+    try:
+        seed_badges()
+        db.session.commit()
+    except IntegrityError:
+        # Another worker booting at the same time seeded them first
+        db.session.rollback()
+    catalog.load()
+
+
+@event.listens_for(Badge, 'after_insert')
+@event.listens_for(Badge, 'after_update')
+@event.listens_for(Badge, 'after_delete')
+def _badge_changed(mapper, connection, target):
+    catalog.invalidate()
+
+
+def held_badges_stmt(user_id, badge_ids):
+    return select(UserBadge.badge_id).where(UserBadge.user_id == user_id, UserBadge.badge_id.in_(badge_ids))
+
+
+def award_crossed(user_id, before, after):
+    """Award the badges whose threshold lies between two counter snapshots.
+
+    `before` and `after` are {'goals': n, 'points': n} for the same user around
+    a single update, so only the thresholds that update crossed are looked at.
+    Does not commit.
+    """
+    badges = catalog.crossed(before, after)
+    if not badges:
+        return []
+
+    held = set(db.session.scalars(held_badges_stmt(user_id, [b['id'] for b in badges])))
+    earned = []
+    for badge in badges:
+        if badge['id'] in held:
+            continue
+        user_badge = UserBadge(user_id=user_id, badge_id=badge['id'], earned_date=datetime.utcnow())
+        db.session.add(user_badge)
+        earned.append(user_badge)
+    return earned
+
+
+def backfill_badge_progress():
+    """Recount completed goals per user and award every badge already reached.
+
+    Used once when migrating a database from the old recompute-on-read
+    scheme; a handful of set-based statements regardless of user count.
+    """
+    seed_badges()
+    completed = select(func.count(Goal.id)).where(
+        Goal.user_id == User.id, Goal.completed == True
+    ).scalar_subquery()
+    db.session.execute(db.update(User).values(goals_completed=completed))
+
+    for key, (name, _, _) in badge_defs.items():
+        counter, threshold = badge_rule(key)
+        column = User.goals_completed if counter == 'goals' else User.totalPoints
+        badge_id = select(Badge.id).where(Badge.name == name).scalar_subquery()
+        already = exists().where(and_(UserBadge.user_id == User.id, UserBadge.badge_id == badge_id))
+        db.session.execute(db.insert(UserBadge).from_select(
+            ['user_id', 'badge_id', 'earned_date'],
+            select(User.id, badge_id, func.current_timestamp()).where(column >= threshold, ~already)
+        ))
+    db.session.commit()
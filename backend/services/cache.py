@@ -0,0 +1,171 @@
+"""Small TTL + LRU response cache with request coalescing.
+
+Two interchangeable backends: `MemoryBackend` (per process) and
+`SQLiteBackend` (a separate SQLite file, shared by every worker on the
+host). `CoalescingCache` sits in front of either and makes sure concurrent
+misses for the same key trigger a single computation.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBackend:
+    """Values are stored as JSON; least recently read rows are evicted first."""
+
+    def __init__(self, path, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_used ON cache (used)')
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                return None
+            self._conn.execute('UPDATE cache SET used = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, used) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + ttl, now)
+            )
+            self._conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache')
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CoalescingCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def put(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, computing it at most once at a time.
+
+        Callers that miss while another thread is already computing the same
+        key wait for that result (or its exception) instead of calling
+        `compute` themselves. Exceptions are never cached.
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _InFlight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self.backend.set(key, flight.value, self.ttl)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+
+def make_cache(config, prefix):
+    """Build a cache from app config keys named <PREFIX>_CACHE_BACKEND/_TTL/_SIZE/_PATH."""
+    backend = config.get(f'{prefix}_CACHE_BACKEND', 'memory')
+    size = config.get(f'{prefix}_CACHE_SIZE', 1024)
+    if backend == 'sqlite':
+        store = SQLiteBackend(config[f'{prefix}_CACHE_PATH'], max_entries=size)
+    elif backend == 'memory':
+        store = MemoryBackend(max_entries=size)
+    else:
+        raise ValueError(f'Unknown cache backend {backend!r}')
+    return CoalescingCache(store, ttl=config.get(f'{prefix}_CACHE_TTL', 6 * 3600))
+
+
+_app_cache_lock = threading.Lock()
+
+
+def app_cache(prefix):
+    """The current app's cache for `prefix`, built from its config on first use."""
+    name = f'{prefix.lower()}_cache'
+    cache = current_app.extensions.get(name)
+    if cache is None:
+        with _app_cache_lock:
+            cache = current_app.extensions.get(name)
+            if cache is None:
+                cache = current_app.extensions[name] = make_cache(current_app.config, prefix)
+    return cache
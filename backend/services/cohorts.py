@@ -0,0 +1,176 @@
+"""Daily footprint distributions per (location_type, household_size) cohort.
+
+Each cohort is a fixed log-spaced histogram of daily totals (kg CO2e, all
+four categories) in CohortBin rows. Every DailyData write moves one sample
+between bins with an in-SQL increment, so percentiles and medians are read
+from at most BIN_COUNT rows no matter how many users or days there are.
+Bins grow by BIN_GROWTH, so values read back are within ~4% of exact.
+
+`refresh_cohorts` rebuilds the histograms from DailyData and resets users'
+baseline_footprint to their cohort median; run it periodically
+(`flask --app app refresh-cohorts`), e.g. nightly from cron.
+"""
+import math
+
+from extensions import db, increment_rows
+from models import User, DailyData, CohortBin
+from services.emissions import CATEGORIES
+from sqlalchemy import insert, update, func, select
+
+BIN_MIN = 0.1  # kg/day; bin 0 holds everything below, including zero
+BIN_GROWTH = 1.08
+BIN_COUNT = 128  # the last bin holds everything above ~1,700 kg/day
+
+# Cohorts with fewer logged days than this keep the static signup baseline
+MIN_SAMPLES = 30
+
+
+def cohort_key(location_type, household_size):
+    return (location_type or '').strip().lower(), int(household_size or 1)
+
+
+def bin_of(value):
+    if value < BIN_MIN:
+        return 0
+    return min(BIN_COUNT - 1, 1 + int(math.log(value / BIN_MIN) / math.log(BIN_GROWTH)))
+
+
+def bin_edges(b):
+    if b == 0:
+        return 0.0, BIN_MIN
+    return BIN_MIN * BIN_GROWTH ** (b - 1), BIN_MIN * BIN_GROWTH ** b
+
+
+def user_cohorts(user_ids):
+    """user id -> (location_type, household_size) for the given users."""
+    return {
+        uid: (loc, size) for uid, loc, size in db.session.query(
+            User.id, User.location_type, User.household_size
+        ).filter(User.id.in_(set(user_ids)))
+    }
+
+
+def cohort_bins_stmt(cohorts):
+    """Keys of the bins for a set of (location_type, household_size) cohorts; may include a few others too."""
+    return select(CohortBin.location_type, CohortBin.household_size, CohortBin.bin).where(
+        CohortBin.location_type.in_({loc for loc, _ in cohorts}),
+        CohortBin.household_size.in_({size for _, size in cohorts})
+    )
+
+
+def record_samples(changes):
+    """Move daily totals between histogram bins.
+
+    `changes` is an iterable of (location_type, household_size, old, new)
+    daily totals; old is None for a new day, new is None for a removed one.
+    Existing bins are incremented in SQL like the emission rollups. Does
+    not commit.
+    """
+    deltas = {}
+    for loc, size, old, new in changes:
+        cohort = cohort_key(loc, size)
+        for value, step in ((old, -1), (new, 1)):
+            if value is not None:
+                key = cohort + (bin_of(value),)
+                deltas[key] = deltas.get(key, 0) + step
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    cohorts = {(loc, size) for loc, size, _ in deltas}
+    increment_rows(CohortBin, ('location_type', 'household_size', 'bin'),
+                   {key: {'count': delta} for key, delta in deltas.items()}, cohort_bins_stmt(cohorts))
+
+
+def histogram(location_type, household_size):
+    """Counts per bin (a list of BIN_COUNT ints) for one cohort."""
+    counts = [0] * BIN_COUNT
+    for b, count in db.session.execute(histogram_stmt(location_type, household_size)):
+        counts[b] = count
+    return counts
+
+
+def histogram_stmt(location_type, household_size):
+    loc, size = cohort_key(location_type, household_size)
+    return select(CohortBin.bin, CohortBin.count).where(
+        CohortBin.location_type == loc, CohortBin.household_size == size)
+
+
+def quantile(counts, q):
+    """Value at quantile q (0..1), interpolated within the bin; None if empty."""
+    total = sum(counts)
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for b, count in enumerate(counts):
+        if count and seen + count >= target:
+            low, high = bin_edges(b)
+            return low + (high - low) * (target - seen) / count
+        seen += count
+    return bin_edges(BIN_COUNT - 1)[1]
+
+
+def percentile(counts, value):
+    """Share of the cohort's days below `value`, 0-100; None if the cohort is empty."""
+    total = sum(counts)
+    if not total:
+        return None
+    b = bin_of(value)
+    low, high = bin_edges(b)
+    within = min(max((value - low) / (high - low), 0.0), 1.0)
+    return 100.0 * (sum(counts[:b]) + counts[b] * within) / total
+
+
+def cohort_baseline(location_type, household_size):
+    """Cohort median daily footprint, or None while the cohort has too few samples."""
+    counts = histogram(location_type, household_size)
+    if sum(counts) < MIN_SAMPLES:
+        return None
+    return round(quantile(counts, 0.5), 2)
+
+
+def refresh_cohorts(batch_size=20000):
+    """Rebuild every histogram from DailyData and refresh baselines from the medians.
+
+    Reads DailyData in keyset batches; only the histograms are held in
+    memory. Returns (days counted, users whose baseline was updated).
+    """
+    hist = {}
+    last_id = 0
+    days = 0
+    while True:
+        rows = db.session.query(
+            DailyData.id, User.location_type, User.household_size,
+            *(getattr(DailyData, c) for c in CATEGORIES)
+        ).join(User, User.id == DailyData.user_id).filter(DailyData.id > last_id) \
+            .order_by(DailyData.id).limit(batch_size).all()
+        if not rows:
+            break
+        for row in rows:
+            counts = hist.setdefault(cohort_key(row.location_type, row.household_size), [0] * BIN_COUNT)
+            counts[bin_of(sum(getattr(row, c) or 0 for c in CATEGORIES))] += 1
+        last_id = rows[-1].id
+        days += len(rows)
+
+    db.session.query(CohortBin).delete()
+    bins = [
+        dict(location_type=loc, household_size=size, bin=b, count=count)
+        for (loc, size), counts in hist.items() for b, count in enumerate(counts) if count
+    ]
+    if bins:
+        db.session.execute(insert(CohortBin), bins)
+
+    updated = 0
+    for (loc, size), counts in hist.items():
+        if sum(counts) < MIN_SAMPLES:
+            continue
+        result = db.session.execute(
+            update(User)
+            .where(func.lower(func.trim(User.location_type)) == loc, User.household_size == size)
+            .values(baseline_footprint=round(quantile(counts, 0.5), 2))
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    db.session.commit()
+    return days, updated
@@ -0,0 +1,139 @@
+"""Activity -> kg CO2e conversion with versioned, region-aware factor tables.
+
+Each version maps a `User.location_type` (urban/suburban/rural) to per-unit
+factors; regions a version doesn't list use its 'default' row. New factors
+go in as a new version, never by editing an old one, because every
+DailyData row records the version it was computed with and
+`rederive_emissions` scales stored values by the ratio between versions.
+Version 1 has only the 'default' row (the factors add_data always used),
+so for now every region gets the same factors; region rows come with the
+next version.
+
+`calculate_batch` converts many records in one NumPy operation, falling
+back to plain Python when NumPy isn't installed. NumPy is imported on the
+first batch, not with the app.
+"""
+from functools import lru_cache
+
+from extensions import db
+from models import DailyData, User
+from sqlalchemy import update, select, case, func
+
+CATEGORIES = ('travel', 'food', 'waste', 'electricity')
+
+# kg CO2 per unit of activity: km travelled, meals, kg of waste, kWh
+FACTOR_TABLES = {
+    # The factors add_data has always used, for every region
+    1: {
+        'default': {'travel': 0.192, 'food': 2.5, 'waste': 1.5, 'electricity': 4.5},
+    },
+}
+CURRENT_VERSION = max(FACTOR_TABLES)
+
+
+def _region(location_type):
+    return (location_type or 'default').strip().lower()
+
+
+@lru_cache(maxsize=None)
+def factors(location_type=None, version=CURRENT_VERSION):
+    """Factors for a region as a tuple in CATEGORIES order."""
+    table = FACTOR_TABLES[version]
+    row = table.get(_region(location_type), table['default'])
+    return tuple(row[c] for c in CATEGORIES)
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """The numpy module, or None when it isn't installed (calculate_batch works without it)."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@lru_cache(maxsize=None)
+def _factor_matrix(version):
+    """(region -> row index, one row of factors per region); the last row is 'default'."""
+    np = _numpy()
+    regions = [r for r in FACTOR_TABLES[version] if r != 'default'] + ['default']
+    rows = [factors(r, version) for r in regions]
+    return {r: i for i, r in enumerate(regions)}, (np.array(rows) if np is not None else rows)
+
+
+def calculate_emissions(activity, location_type=None, version=CURRENT_VERSION):
+    """Emissions for one activity record (a dict with the four categories)."""
+    return {c: f * float(activity[c]) for c, f in zip(CATEGORIES, factors(location_type, version))}
+
+
+def calculate_batch(activities, location_types=None, version=CURRENT_VERSION):
+    """Emissions for many activity records at once.
+
+    `location_types` is one region per record, or None for the default
+    factors throughout. Returns a list of dicts in the input order.
+    """
+    if not activities:
+        return []
+    np = _numpy()
+    index, matrix = _factor_matrix(version)
+    default = index['default']
+    if location_types is None:
+        rows = [default] * len(activities)
+    else:
+        rows = [index.get(_region(loc), default) for loc in location_types]
+
+    if np is not None:
+        values = np.array([[float(a[c]) for c in CATEGORIES] for a in activities], dtype=float)
+        result = (values * matrix[np.array(rows)]).tolist()
+    else:
+        result = [
+            [f * float(a[c]) for c, f in zip(CATEGORIES, matrix[r])]
+            for a, r in zip(activities, rows)
+        ]
+    return [dict(zip(CATEGORIES, values)) for values in result]
+
+
+def rederive_emissions(version=CURRENT_VERSION, batch_size=20000):
+    """Rescale stored DailyData emissions computed with older factor versions.
+
+    Only emissions are stored, so each category is multiplied by the ratio of
+    new to old factor for the row's region, in SQL, one id range per
+    transaction. Rollups must be rebuilt afterwards. Returns rows updated.
+    """
+    old_versions = [v for (v,) in db.session.query(DailyData.factor_version).filter(
+        DailyData.factor_version != version).distinct()]
+    region = select(User.location_type).where(User.id == DailyData.user_id).scalar_subquery()
+    region = func.lower(func.trim(func.coalesce(region, 'default')))
+    max_id = db.session.query(func.max(DailyData.id)).scalar() or 0
+
+    updated = 0
+    for old in old_versions:
+        regions = set(FACTOR_TABLES[old]) | set(FACTOR_TABLES[version])
+        ratios = {}
+        for r in regions:
+            new_f, old_f = factors(r, version), factors(r, old)
+            ratios[r] = [n / o if o else None for n, o in zip(new_f, old_f)]
+            if None in ratios[r]:
+                raise ValueError(f'Version {old} has a zero factor for {r}; cannot rescale its rows')
+        explicit = sorted(r for r in regions if r != 'default')
+
+        values = {'factor_version': version}
+        for i, c in enumerate(CATEGORIES):
+            column = getattr(DailyData, c)
+            if explicit:
+                ratio = case({r: ratios[r][i] for r in explicit}, value=region, else_=ratios['default'][i])
+            else:
+                ratio = ratios['default'][i]
+            values[c] = column * ratio
+
+        for low in range(0, max_id + 1, batch_size):
+            result = db.session.execute(
+                update(DailyData)
+                .where(DailyData.factor_version == old, DailyData.id > low, DailyData.id <= low + batch_size)
+                .values(values)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            updated += result.rowcount
+    return updated
@@ -0,0 +1,109 @@
+"""Streaming CSV/NDJSON export of emission, goal and badge history.
+
+Rows are read in keyset batches (never OFFSET, never the whole result), so
+an export holds one batch in memory at a time whatever its size. Each
+batch is serialized to a single text chunk; `gzip_stream` compresses
+chunks as they go.
+"""
+import csv
+import io
+import json
+import zlib
+
+from extensions import db
+from models import DailyData, Goal, UserBadge, Badge
+from sqlalchemy import select, or_, and_
+
+DEFAULT_BATCH_SIZE = 1000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# kind -> (columns, per-user keyset order). A user's daily rows are walked in
+# date order along ix_daily_data_user_date (one row per date); everything
+# else by primary key.
+EXPORTS = {
+    'daily_data': (
+        (DailyData.id, DailyData.user_id, DailyData.date, DailyData.travel, DailyData.food,
+         DailyData.waste, DailyData.electricity, DailyData.factor_version),
+        (DailyData.date,),
+    ),
+    'goals': (
+        (Goal.id, Goal.user_id, Goal.title, Goal.description, Goal.category, Goal.points,
+         Goal.completed, Goal.date_completed, Goal.generated_at),
+        (Goal.id,),
+    ),
+    'badges': (
+        (UserBadge.id, UserBadge.user_id, UserBadge.badge_id, Badge.name.label('badge_name'),
+         UserBadge.earned_date),
+        (UserBadge.id,),
+    ),
+}
+
+
+def _after(order, last):
+    """Keyset condition for rows strictly after `last` in (a, b, ...) order."""
+    branches = []
+    for i, column in enumerate(order):
+        branches.append(and_(*(order[j] == last[j] for j in range(i)), column > last[i]))
+    return or_(*branches)
+
+
+def export_stmt(kind, user_id=None):
+    """Base select for an export; `user_id=None` exports every user."""
+    columns, order = EXPORTS[kind]
+    if user_id is None:
+        order = (columns[0],)  # primary key
+    stmt = select(*columns)
+    if kind == 'badges':
+        stmt = stmt.outerjoin(Badge, Badge.id == UserBadge.badge_id)
+    if user_id is not None:
+        stmt = stmt.where(columns[1] == user_id)
+    return stmt.order_by(*order), order
+
+
+def iter_batches(kind, user_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    stmt, order = export_stmt(kind, user_id)
+    last = None
+    while True:
+        batch_stmt = stmt if last is None else stmt.where(_after(order, last))
+        rows = db.session.execute(batch_stmt.limit(batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        last = tuple(getattr(rows[-1], column.key) for column in order)
+
+
+def _value(v):
+    return v.isoformat() if hasattr(v, 'isoformat') else v
+
+
+def serialize(kind, batches, fmt='csv'):
+    """Yield one text chunk per batch (plus a CSV header first)."""
+    columns = [c.key for c in EXPORTS[kind][0]]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_value(v) for v in row] for row in rows)
+            yield buffer.getvalue()
+    else:
+        for rows in batches:
+            yield ''.join(
+                json.dumps(dict(zip(columns, map(_value, row)))) + '\n' for row in rows
+            )
+
+
+def gzip_stream(chunks, level=6):
+    """Compress an iterable of text chunks into a gzip byte stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
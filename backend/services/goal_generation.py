@@ -0,0 +1,106 @@
+"""Asking the LLM for goals that fit a 14-day emission summary.
+
+Shared by the per-user /generate_goals route and the batched weekly sweep
+(services.goal_sweep), which sends one prompt per group of similar users.
+Replies are read as a stream, so goals are available one by one as the
+model writes them. `suggest_goals` falls back to the offline templates
+(services.offline_advice).
+"""
+from services.llm import get_provider
+from services.llm_json import JsonExtractor, validate, GOAL, SchemaError
+from services.logs import get_logger
+from services.offline_advice import offline_goals, use_offline, fallback_enabled
+
+log = get_logger('goal_generation')
+
+
+class InvalidGoalResponse(ValueError):
+    def __init__(self, raw):
+        super().__init__('Response from Gemini was not valid JSON')
+        self.raw = raw
+
+
+def build_goal_prompt(summary):
+    return f"""
+You are an expert environmental assistant. A user has emitted the following carbon emissions in the last 14 days:
+- Travel: {summary['travel']} kg CO2
+- Food: {summary['food']} kg CO2
+- Waste: {summary['waste']} kg CO2
+- Electricity: {summary['electricity']} kg CO2
+
+Based on this data, suggest 3 to 5 personalized, actionable sustainability goals that can help reduce their carbon footprint.
+
+For each goal, provide:
+- title (string)
+- description (string)
+- category: one of ['travel', 'food', 'waste', 'electricity']
+- points (integer between 10 and 30)
+
+Return only a valid JSON array of objects in the following format:
+[
+  {{
+    "title": "...",
+    "description": "...",
+    "category": "...",
+    "points": 20
+  }}
+]
+No explanation or preamble. Only return the JSON.
+"""
+
+
+def stream_goals(summary):
+    """Yield goal dicts (title, description, category, points) as the LLM writes them.
+
+    Each array element is checked against llm_json.GOAL as soon as it
+    closes, and skipped if it doesn't fit. Raises InvalidGoalResponse if
+    the reply yields no valid goal at all.
+    """
+    extractor = JsonExtractor(list, schema=GOAL)
+    produced = 0
+    chunks = get_provider().stream(build_goal_prompt(summary), temperature=0.7, top_p=1)
+    try:
+        for chunk in chunks:
+            for element in extractor.feed(chunk):
+                try:
+                    goal = validate(element, GOAL)
+                except SchemaError as e:
+                    log.warning('skipping invalid goal', extra={'fields': {'error': str(e)}})
+                    continue
+                produced += 1
+                yield goal
+            if extractor.complete:
+                break
+    finally:
+        chunks.close()  # stop reading whatever prose follows the array
+    if not produced:
+        raise InvalidGoalResponse(extractor.text)
+
+
+def suggest_goals(summary, days=14, on_goal=None):
+    """(goals, source) for `summary`, source being 'llm' or 'offline'.
+
+    The templates answer when the LLM is switched off or saturated, and
+    when it fails, unless ADVICE_FALLBACK is off (then the error propagates).
+    `on_goal` is called with each goal as soon as it is available.
+    """
+    emit = on_goal or (lambda goal: None)
+    if not use_offline():
+        goals = []
+        try:
+            for goal in stream_goals(summary):
+                emit(goal)
+                goals.append(goal)
+            return goals, 'llm'
+        except Exception as e:
+            if goals:
+                # Those already handed out stand; don't pad them with templates
+                log.warning('LLM goal stream broke off', extra={'fields': {'kept': len(goals), 'error': str(e)}})
+                return goals, 'llm'
+            if not fallback_enabled():
+                raise
+            log.warning('LLM goals failed, using offline templates', extra={'fields': {'error': str(e)}})
+    goals = offline_goals(summary, days)
+    for goal in goals:
+        emit(goal)
+    return goals, 'offline'
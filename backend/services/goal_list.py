@@ -0,0 +1,109 @@
+from extensions import db
+from models import Goal
+from datetime import datetime
+from sqlalchemy import or_, and_, func, case, select
+import hashlib
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Response field -> column; the same keys the unpaged list has always returned
+FIELDS = {
+    'id': Goal.id,
+    'title': Goal.title,
+    'description': Goal.description,
+    'category': Goal.category,
+    'points': Goal.points,
+    'completed': Goal.completed,
+    'dateCompleted': Goal.date_completed,
+    'generatedAt': Goal.generated_at,
+}
+LEGACY_FIELDS = ('id', 'title', 'description', 'category', 'points', 'completed', 'dateCompleted')
+STATUSES = ('completed', 'pending')
+
+
+def encode_cursor(generated_at, goal_id):
+    return f'{generated_at.isoformat()}:{goal_id}'
+
+
+def decode_cursor(cursor):
+    generated_at, goal_id = cursor.rsplit(':', 1)
+    return datetime.fromisoformat(generated_at), int(goal_id)
+
+
+def _filtered(stmt, user_id, status=None, category=None):
+    stmt = stmt.where(Goal.user_id == user_id)
+    if status == 'completed':
+        stmt = stmt.where(Goal.completed.is_(True))
+    elif status == 'pending':
+        stmt = stmt.where(Goal.completed.is_(False))
+    if category:
+        stmt = stmt.where(Goal.category == category)
+    return stmt
+
+
+def _serialize(row, fields):
+    goal = {}
+    for name in fields:
+        value = getattr(row, name)
+        goal[name] = value.isoformat() if isinstance(value, datetime) else value
+    return goal
+
+
+def fingerprint_stmt(user_id):
+    return select(
+        func.count(Goal.id), func.sum(Goal.id), func.max(Goal.generated_at),
+        func.sum(case((Goal.completed.is_(True), 1), else_=0))
+    ).where(Goal.user_id == user_id)
+
+
+def fingerprint(user_id, *parts):
+    """ETag for a user's goals as filtered by `parts` (e.g. the query string).
+
+    Goals are added, completed and deleted (maintenance scripts clear
+    them), and SQLite hands the ids of deleted rows to new ones, so the
+    highest id alone can come back unchanged. Replacements carry a newer
+    generated_at, the id sum moves when any goal is swapped for another,
+    and the completed count moves on completion. One aggregate over the
+    user's goals, no row data loaded.
+    """
+    count, id_sum, newest, completed = db.session.execute(fingerprint_stmt(user_id)).one()
+    key = '|'.join(map(str, (user_id, count, id_sum, newest, completed) + parts))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def all_goals_stmt(user_id, fields=LEGACY_FIELDS):
+    return select(*(FIELDS[f].label(f) for f in fields)).where(Goal.user_id == user_id).order_by(Goal.id)
+
+
+def all_goals(user_id, fields=LEGACY_FIELDS):
+    """Every goal for a user, in id order (the original unpaged list)."""
+    rows = db.session.execute(all_goals_stmt(user_id, fields)).all()
+    return [_serialize(row, fields) for row in rows]
+
+
+def page_stmt(user_id, limit, cursor=None, status=None, category=None, fields=LEGACY_FIELDS):
+    columns = {f: FIELDS[f] for f in fields}
+    columns.setdefault('cursor_generated_at', Goal.generated_at)
+    columns.setdefault('cursor_id', Goal.id)
+    stmt = _filtered(select(*(c.label(name) for name, c in columns.items())), user_id, status, category)
+    if cursor:
+        generated_at, goal_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Goal.generated_at < generated_at,
+            and_(Goal.generated_at == generated_at, Goal.id < goal_id)
+        ))
+    return stmt.order_by(Goal.generated_at.desc(), Goal.id.desc()).limit(limit)
+
+
+def page(user_id, limit=DEFAULT_PAGE_SIZE, cursor=None, status=None, category=None, fields=LEGACY_FIELDS):
+    """One page of goals, newest first, keyset-paged on (generated_at, id).
+
+    Only the requested columns (plus the two the cursor needs) are loaded.
+    Returns (goals, next_cursor).
+    """
+    rows = db.session.execute(page_stmt(user_id, limit + 1, cursor, status, category, fields)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].cursor_generated_at, rows[-1].cursor_id) if more else None
+    return [_serialize(row, fields) for row in rows], next_cursor
@@ -0,0 +1,121 @@
+"""Batched weekly goal generation for every user who is due.
+
+`flask --app app sweep-goals` walks users in id order, `batch_size` at a
+time. Per batch, one query finds the users without a goal in the last
+REFRESH_DAYS and one aggregate query sums their last SUMMARY_DAYS of
+emissions from the rollups. Users whose summaries land in the same bucket
+(each category's kg and the days logged, on a doubling scale) share one
+LLM call for the whole sweep, and their goals go in with a single
+multi-row INSERT.
+
+Progress is kept in a GoalSweep row, committed in the same transaction as
+each batch's goals: an interrupted sweep picks up after the last finished
+batch when run again, with the same cutoff. Groups the LLM can't answer get
+the offline templates (services.offline_advice) unless ADVICE_FALLBACK is
+off; users skipped for lack of data or a failed call are retried by the
+next sweep, not this one.
+"""
+import math
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import exists, insert, select
+
+from extensions import db
+from models import User, Goal, GoalSweep
+from services.rollups import window_totals_many, CATEGORIES
+from services.goal_generation import suggest_goals
+from services.jobs import RateLimiter
+from services.logs import get_logger
+
+REFRESH_DAYS = 7  # same rule as /generate_goals
+SUMMARY_DAYS = 14
+BUCKET_GROWTH = 2.0  # per-category bucket edges at 0, 1, 3, 7, 15... kg
+
+log = get_logger('goal_sweep')
+
+
+def summary_bucket(summary):
+    """Coarse key for a 14-day summary; similar users get the same one.
+
+    Days logged are part of it, since the offline templates average over them.
+    """
+    return tuple(int(math.log(max(summary[k], 0) + 1, BUCKET_GROWTH)) for k in CATEGORIES + ('entries',))
+
+
+def due_users_stmt(after_id, cutoff, limit):
+    recent = exists().where(Goal.user_id == User.id, Goal.generated_at >= cutoff)
+    return select(User.id).where(User.id > after_id, ~recent).order_by(User.id).limit(limit)
+
+
+def _open_sweep(restart):
+    sweep = None if restart else GoalSweep.query.filter(
+        GoalSweep.finished_at.is_(None)).order_by(GoalSweep.id.desc()).first()
+    if sweep is None:
+        sweep = GoalSweep(started_at=datetime.utcnow())
+        db.session.add(sweep)
+        db.session.commit()
+    return sweep
+
+
+def run_sweep(batch_size=500, restart=False, progress=None):
+    """Give every due user fresh goals; returns the finished GoalSweep.
+
+    Resumes the latest unfinished sweep unless `restart`. `progress`, if
+    given, is called with the sweep after each committed batch.
+    """
+    sweep = _open_sweep(restart)
+    cutoff = sweep.started_at - timedelta(days=REFRESH_DAYS)
+    end = sweep.started_at.date()
+    start = end - timedelta(days=SUMMARY_DAYS)
+    limiter = RateLimiter(current_app.config.get('GOAL_SWEEP_RATE_PER_MINUTE', 0))
+    shared = {}  # bucket -> goals (None if the call failed), for the whole run
+
+    while True:
+        user_ids = db.session.scalars(due_users_stmt(sweep.last_user_id, cutoff, batch_size)).all()
+        if not user_ids:
+            break
+        summaries = window_totals_many(user_ids, start, end)
+        groups = {}
+        for user_id in user_ids:
+            if user_id in summaries:
+                groups.setdefault(summary_bucket(summaries[user_id]), []).append(user_id)
+
+        rows = []
+        given = 0
+        for bucket, members in groups.items():
+            if bucket not in shared:
+                # The group's mean stands in for every member in the prompt
+                summary = {c: round(sum(summaries[u][c] for u in members) / len(members), 2)
+                           for c in CATEGORIES + ('entries',)}
+                if current_app.config.get('ADVICE_ENGINE', 'llm') != 'offline':
+                    limiter.wait()
+                try:
+                    shared[bucket], source = suggest_goals(summary)
+                    sweep.llm_calls += source == 'llm'
+                except Exception as e:
+                    shared[bucket] = None
+                    log.warning('sweep goal request failed', extra={'fields': {
+                        'sweep': sweep.id, 'bucket': bucket, 'users': len(members), 'error': str(e)}})
+            goals = shared[bucket]
+            if not goals:
+                continue
+            rows += [dict(goal, user_id=user_id) for user_id in members for goal in goals]
+            given += len(members)
+
+        if rows:
+            db.session.execute(insert(Goal), rows)
+        sweep.last_user_id = user_ids[-1]
+        sweep.users += given
+        sweep.skipped += len(user_ids) - given
+        sweep.goals += len(rows)
+        db.session.commit()
+        if progress:
+            progress(sweep)
+
+    sweep.finished_at = datetime.utcnow()
+    db.session.commit()
+    log.info('goal sweep finished', extra={'fields': {
+        'sweep': sweep.id, 'users': sweep.users, 'skipped': sweep.skipped,
+        'llm_calls': sweep.llm_calls, 'goals': sweep.goals}})
+    return sweep
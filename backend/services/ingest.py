@@ -0,0 +1,153 @@
+from extensions import db
+from models import DailyData
+from services.rollups import apply_deltas
+from services.emissions import CATEGORIES, CURRENT_VERSION, calculate_batch
+from services.cohorts import user_cohorts, record_samples
+from datetime import date
+from sqlalchemy import insert, update, select
+import json
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class IngestError(ValueError):
+    def __init__(self, message, line=None):
+        super().__init__(message)
+        self.line = line
+        # Counts from chunks committed before the bad record was reached
+        self.committed = None
+
+
+def parse_record(raw, line=None):
+    """Validate one incoming record; activity values are converted per chunk in upsert_chunk."""
+    if not isinstance(raw, dict):
+        raise IngestError('Record must be an object', line)
+    try:
+        user_id = int(raw['user_id'])
+        day = date.fromisoformat(raw['date'])
+        activity = {c: float(raw[c]) for c in CATEGORIES}
+    except KeyError as e:
+        raise IngestError(f'Missing field {e.args[0]}', line)
+    except (TypeError, ValueError):
+        raise IngestError('Invalid user_id, date or activity value', line)
+    return dict(user_id=user_id, date=day, **activity)
+
+
+def iter_json_records(records):
+    for i, raw in enumerate(records, start=1):
+        yield parse_record(raw, i)
+
+
+def iter_ndjson_records(lines):
+    """Parse an NDJSON stream lazily so large uploads never sit in memory at once."""
+    for i, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            raw = json.loads(line)
+        except json.JSONDecodeError:
+            raise IngestError('Invalid JSON', i)
+        yield parse_record(raw, i)
+
+
+def existing_days_stmt(user_ids, first, last):
+    """DailyData rows for these users between two dates; callers match the exact days."""
+    return select(
+        DailyData.id, DailyData.user_id, DailyData.date, *(getattr(DailyData, c) for c in CATEGORIES)
+    ).where(DailyData.user_id.in_(user_ids), DailyData.date.between(first, last))
+
+
+def upsert_chunk(rows, overwrite=True, skipped=None):
+    """Insert or overwrite a chunk of parsed rows keyed on (user_id, date).
+
+    Activity values are converted to emissions for the whole chunk in one
+    batch, using each user's regional factors. Existing rows are found with
+    one set-based query, new rows go out as a multi-row INSERT and existing
+    ones as a bulk UPDATE by primary key. The emission rollups are adjusted
+    by the difference, and the cohort histograms by the moved samples, in the
+    same transaction. With `overwrite` off, rows for days that already exist
+    are left alone, and their (user_id, date) keys appended to `skipped` if
+    given. Raises IngestError, writing nothing, if any user_id
+    doesn't exist. Returns (inserted, updated).
+    """
+    # Last record wins when a chunk repeats the same day for a user
+    by_key = {(r['user_id'], r['date']): r for r in rows}
+    if not by_key:
+        return 0, 0
+
+    cohorts = user_cohorts(user_id for user_id, _ in by_key)
+    unknown = sorted({user_id for user_id, _ in by_key} - set(cohorts))
+    if unknown:
+        raise IngestError(f"Unknown user_id {', '.join(map(str, unknown))}")
+    activities = list(by_key.values())
+    emissions = calculate_batch(activities, [cohorts[a['user_id']][0] for a in activities])
+    for key, a, e in zip(list(by_key), activities, emissions):
+        by_key[key] = dict(e, user_id=a['user_id'], date=a['date'], factor_version=CURRENT_VERSION)
+
+    # SQLite can't drive a row-value IN list through an index, so fetch the
+    # per-user date range (an index range scan) and match exact keys here
+    dates = [day for _, day in by_key]
+    existing = {
+        (row.user_id, row.date): row
+        for row in db.session.execute(
+            existing_days_stmt({user_id for user_id, _ in by_key}, min(dates), max(dates)))
+        if (row.user_id, row.date) in by_key
+    }
+
+    to_insert = []
+    to_update = []
+    deltas = []
+    samples = []
+    for key, row in by_key.items():
+        old = existing.get(key)
+        if old is not None and not overwrite:
+            if skipped is not None:
+                skipped.append(key)
+            continue
+        if old is not None:
+            to_update.append(dict(row, id=old.id))
+            deltas.append(dict(row, entries=0, **{c: row[c] - (getattr(old, c) or 0) for c in CATEGORIES}))
+        else:
+            to_insert.append(row)
+            deltas.append(dict(row, entries=1))
+        samples.append(cohorts[key[0]] + (
+            sum(getattr(old, c) or 0 for c in CATEGORIES) if old is not None else None,
+            sum(row[c] for c in CATEGORIES)
+        ))
+
+    if to_insert:
+        db.session.execute(insert(DailyData), to_insert)
+    if to_update:
+        db.session.execute(update(DailyData), to_update)
+    apply_deltas(deltas)
+    record_samples(samples)
+    return len(to_insert), len(to_update)
+
+
+def bulk_upsert(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upsert an iterable of parsed rows, committing once per chunk."""
+    counts = {'inserted': 0, 'updated': 0}
+
+    def flush(chunk):
+        inserted, updated = upsert_chunk(chunk)
+        db.session.commit()
+        counts['inserted'] += inserted
+        counts['updated'] += updated
+
+    chunk = []
+    try:
+        for row in records:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    except IngestError as e:
+        db.session.rollback()
+        e.committed = dict(counts)
+        raise
+    return counts
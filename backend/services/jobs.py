@@ -0,0 +1,113 @@
+"""In-process background jobs for slow, LLM-backed work.
+
+Jobs run on a bounded thread pool inside an app context, start no faster
+than the configured rate, and keep their status/result in memory for a
+while after finishing so clients can poll for them. Status lives in the
+process that accepted the job, so behind a multi-process server the poll
+must reach the same worker (or run with a single worker for jobs).
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+
+class RateLimiter:
+    """Spaces calls at least 60/per_minute seconds apart, blocking callers until their slot."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class JobQueue:
+    def __init__(self, app, workers=4, per_minute=30, keep_seconds=3600):
+        self.app = app
+        self.keep_seconds = keep_seconds
+        self.limiter = RateLimiter(per_minute)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+        self._jobs = {}
+        self._active = {}  # dedupe key -> job id while queued or running
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, dedupe_key=None, owner=None):
+        """Queue fn(*args) and return its job id right away.
+
+        With `dedupe_key`, a job already queued or running under the same key
+        is returned instead of starting a second one. `owner` is kept on the
+        job so status lookups can be limited to the user who asked for it.
+        """
+        with self._lock:
+            self._prune()
+            if dedupe_key is not None and dedupe_key in self._active:
+                return self._active[dedupe_key]
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id, 'owner': owner, 'status': 'queued', 'result': None, 'error': None,
+                'created': time.time(), 'finished': None
+            }
+            if dedupe_key is not None:
+                self._active[dedupe_key] = job_id
+        self._executor.submit(self._run, job_id, dedupe_key, fn, args)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, dedupe_key, fn, args):
+        self.limiter.wait()
+        self.update(job_id, status='running')
+        try:
+            with self.app.app_context():
+                result = fn(*args)
+            self.update(job_id, status='done', result=result, finished=time.time())
+        except Exception as e:
+            self.update(job_id, status='failed', error=str(e), finished=time.time())
+        finally:
+            with self._lock:
+                if dedupe_key is not None and self._active.get(dedupe_key) == job_id:
+                    del self._active[dedupe_key]
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j for j, job in self._jobs.items() if job['finished'] and job['finished'] < cutoff]:
+            del self._jobs[job_id]
+
+
+_queue_lock = threading.Lock()
+
+
+def job_queue():
+    """The current app's job queue, created from JOB_* config on first use."""
+    queue = current_app.extensions.get('job_queue')
+    if queue is None:
+        with _queue_lock:
+            queue = current_app.extensions.get('job_queue')
+            if queue is None:
+                config = current_app.config
+                queue = current_app.extensions['job_queue'] = JobQueue(
+                    current_app._get_current_object(),
+                    workers=config.get('JOB_WORKERS', 4),
+                    per_minute=config.get('JOB_RATE_PER_MINUTE', 30),
+                    keep_seconds=config.get('JOB_KEEP_SECONDS', 3600)
+                )
+    return queue
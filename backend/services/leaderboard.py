@@ -0,0 +1,119 @@
+"""Leaderboard pages and ranks.
+
+Pages are keyset-paged straight off ix_user_points. Ranks come from
+PointsTally, a count of users per points total that every points change
+updates through `record_points`: the rank of a total is one plus the users
+on higher totals, so it costs a sum over the distinct totals above it (a
+few hundred rows even for the top of a large board) instead of a count over
+every user ranked above, and a tie count is one primary-key lookup.
+"""
+from extensions import db, increment_rows
+from models import User, PointsTally
+from sqlalchemy import or_, and_, func, select, insert
+
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(points, user_id):
+    return f'{points}:{user_id}'
+
+
+def decode_cursor(cursor):
+    points, user_id = cursor.split(':')
+    return int(points), int(user_id)
+
+
+def record_points(changes):
+    """Move users between totals in the tally; `changes` holds (old, new) totals. Does not commit.
+
+    Call it wherever User.totalPoints changes, in the same transaction.
+    Totals that drop to zero users keep their row; it adds nothing to a sum.
+    """
+    deltas = {}
+    for old, new in changes:
+        if old == new:
+            continue
+        if old and old > 0:
+            deltas[old] = deltas.get(old, 0) - 1
+        if new and new > 0:
+            deltas[new] = deltas.get(new, 0) + 1
+    deltas = {points: d for points, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    increment_rows(PointsTally, ('points',), {(p,): {'users': d} for p, d in deltas.items()},
+                   select(PointsTally.points).where(PointsTally.points.in_(deltas)))
+
+
+def rebuild_points_tally():
+    """Recount the tally from User, e.g. after a bulk load or for databases that predate it."""
+    PointsTally.query.delete()
+    db.session.execute(insert(PointsTally).from_select(
+        ['points', 'users'],
+        select(User.totalPoints, func.count(User.id)).where(User.totalPoints > 0).group_by(User.totalPoints)
+    ))
+    db.session.commit()
+
+
+def rank_stmt(points):
+    return select(func.coalesce(func.sum(PointsTally.users), 0)).where(PointsTally.points > points)
+
+
+def ties_stmt(points):
+    return select(PointsTally.users).where(PointsTally.points == points)
+
+
+def page_stmt(limit, cursor=None):
+    stmt = select(User.id, User.username, User.totalPoints).where(User.totalPoints > 0)
+    if cursor:
+        points, user_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            User.totalPoints < points,
+            and_(User.totalPoints == points, User.id > user_id)
+        ))
+    return stmt.order_by(User.totalPoints.desc(), User.id).limit(limit)
+
+
+def rank_of(points):
+    """Competition rank (ties share a rank) for a points total."""
+    return db.session.scalar(rank_stmt(points)) + 1
+
+
+def page(limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """One leaderboard page, highest points first, keyset-paged on (points, id).
+
+    Reads straight off ix_user_points plus two tally reads, so the cost
+    depends on the page size rather than on how many users or goals exist. Returns (entries, next_cursor).
+    """
+    rows = db.session.execute(page_stmt(limit + 1, cursor)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], None
+
+    # Two tally reads anchor the first row's tie group (the cursor may have
+    # split it); every later rank follows from the rows already on this page
+    first = rows[0].totalPoints
+    above = rank_of(first) - 1
+    ties = db.session.scalar(ties_stmt(first)) or 0
+    rank = above + 1
+    behind = 0
+    entries = []
+    for i, row in enumerate(rows):
+        if row.totalPoints != first:
+            if row.totalPoints != rows[i - 1].totalPoints:
+                rank = above + ties + behind + 1
+            behind += 1
+        entries.append({'rank': rank, 'id': row.id, 'name': row.username, 'points': row.totalPoints})
+
+    next_cursor = encode_cursor(rows[-1].totalPoints, rows[-1].id) if more else None
+    return entries, next_cursor
+
+
+def my_rank(user_id):
+    """Return {'rank', 'points'} for a user, or None if they don't exist."""
+    points = db.session.query(User.totalPoints).filter(User.id == user_id).scalar()
+    if points is None:
+        return None
+    return {'rank': rank_of(points), 'points': points}
@@ -0,0 +1,243 @@
+"""One LLM access layer for every blueprint.
+
+`get_provider()` returns the app's provider, built on first use from config:
+
+    LLM_PROVIDER         'gemini' (default) or 'stub'
+    LLM_MODEL            model name for Gemini
+    LLM_TIMEOUT          seconds per upstream call
+    LLM_RETRIES          extra attempts after a retryable failure
+    LLM_BACKOFF          base seconds for exponential backoff between attempts
+    LLM_MAX_CONCURRENCY  upstream calls allowed in flight per process
+
+Providers expose `generate(prompt, temperature=0.7, top_p=1) -> str`,
+`stream(...)`, which yields the same reply in text chunks as they arrive
+(see services.llm_json for parsing them), and `saturated()`, true when a
+new call would have to queue for a slot.
+
+The Gemini SDK (and dotenv, for the API key) are imported only when the
+first Gemini provider is built, so workers that never serve an LLM-backed
+endpoint don't pay for them. Set LLM_PRELOAD to import them at startup
+instead, e.g. in a preforking master so workers share the pages.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from flask import current_app
+from services.logs import get_logger
+from services.metrics import record_llm
+
+log = get_logger('llm')
+
+# The API key lives in routes/.env; a backend/.env is also honoured
+ENV_FILES = [
+    os.path.join(os.path.dirname(__file__), os.pardir, 'routes', '.env'),
+    os.path.join(os.path.dirname(__file__), os.pardir, '.env'),
+]
+
+
+class LLMError(Exception):
+    pass
+
+
+def _retryable(exc):
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int):
+        return code in (408, 429) or code >= 500
+    # httpx timeouts and connection errors surface without a status code
+    return any(word in type(exc).__name__ for word in ('Timeout', 'Connect', 'Network'))
+
+
+class GeminiProvider:
+    """Gemini behind a single shared client (and so one pooled HTTP connection set)."""
+
+    def __init__(self, model='gemini-2.5-flash', timeout=30, retries=2, backoff=0.5, max_concurrency=8):
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0  # calls holding or waiting for a slot
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+                    self._client = genai.Client(
+                        http_options=types.HttpOptions(timeout=int(self.timeout * 1000))
+                    )
+        return self._client
+
+    def saturated(self):
+        return self._in_flight >= self.max_concurrency
+
+    def generate(self, prompt, temperature=0.7, top_p=1):
+        from google.genai import types
+        config = types.GenerateContentConfig(temperature=temperature, top_p=top_p)
+        started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            with self._slots:
+                for attempt in range(self.retries + 1):
+                    try:
+                        response = self.client.models.generate_content(
+                            model=self.model, contents=prompt, config=config
+                        )
+                        return response.text
+                    except Exception as e:
+                        if attempt == self.retries or not _retryable(e):
+                            raise LLMError(str(e)) from e
+                        log.warning('retrying LLM call', extra={'fields': {'attempt': attempt + 1, 'error': str(e)}})
+                        time.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            record_llm(time.perf_counter() - started)
+
+
+    def stream(self, prompt, temperature=0.7, top_p=1):
+        from google.genai import types
+        config = types.GenerateContentConfig(temperature=temperature, top_p=top_p)
+        started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            with self._slots:
+                for attempt in range(self.retries + 1):
+                    sent = False
+                    try:
+                        for chunk in self.client.models.generate_content_stream(
+                            model=self.model, contents=prompt, config=config
+                        ):
+                            if chunk.text:
+                                sent = True
+                                yield chunk.text
+                        return
+                    except Exception as e:
+                        # Once text has gone out a retry would repeat it, so only retry before that
+                        if sent or attempt == self.retries or not _retryable(e):
+                            raise LLMError(str(e)) from e
+                        log.warning('retrying LLM call', extra={'fields': {'attempt': attempt + 1, 'error': str(e)}})
+                        time.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            record_llm(time.perf_counter() - started)
+
+
+class StubProvider:
+    """Deterministic offline stand-in that answers the app's own prompts.
+
+    The reply depends only on the prompt, so identical requests get identical
+    answers; `latency` adds a fixed delay to mimic an upstream round trip
+    during load tests.
+    """
+
+    _amount = re.compile(r'-\s*(Travel|Food|Waste|Electricity):\s*([0-9.]+)')
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def _ranked_categories(self, prompt):
+        amounts = {name.lower(): float(value) for name, value in self._amount.findall(prompt)}
+        return sorted(amounts, key=lambda c: (-amounts[c], c)) or ['travel', 'food', 'electricity', 'waste']
+
+    def saturated(self):
+        return False
+
+    def generate(self, prompt, temperature=0.7, top_p=1):
+        if self.latency:
+            time.sleep(self.latency)
+        record_llm(self.latency)
+        return self._reply(prompt)
+
+    def stream(self, prompt, temperature=0.7, top_p=1, chunk_size=40):
+        # The latency is spread over the chunks, like tokens arriving from upstream
+        reply = self._reply(prompt)
+        chunks = [reply[i:i + chunk_size] for i in range(0, len(reply), chunk_size)]
+        try:
+            for chunk in chunks:
+                if self.latency:
+                    time.sleep(self.latency / len(chunks))
+                yield chunk
+        finally:
+            record_llm(self.latency)
+
+    def _reply(self, prompt):
+        ranked = self._ranked_categories(prompt)
+        if '"priority_actions"' in prompt:
+            return json.dumps({
+                'priority_actions': [
+                    {
+                        'title': f'Cut {c} emissions',
+                        'impact': impact,
+                        'effort': 'Medium',
+                        'co2Savings': f'{1.5 - i * 0.5:.1f} kg/day',
+                        'description': f'{c.capitalize()} is one of your largest sources this month.'
+                    } for i, (c, impact) in enumerate(zip(ranked, ('High', 'Medium', 'Low')))
+                ],
+                'recommendations': [
+                    {'category': name, 'tips': [f'{name} tip {n}' for n in range(1, 4)]}
+                    for name in ('Transportation', 'Food & Diet', 'Energy Usage', 'Waste Reduction')
+                ]
+            })
+        return json.dumps([
+            {
+                'title': f'Reduce {c} emissions this week',
+                'description': f'Stub goal targeting {c}.',
+                'category': c,
+                'points': 30 - i * 5
+            } for i, c in enumerate(ranked[:3])
+        ])
+
+
+def load_env():
+    from dotenv import load_dotenv
+    for path in ENV_FILES:
+        load_dotenv(path)
+
+
+def preload_sdk():
+    """Import the Gemini SDK and load the API key now rather than on first use."""
+    load_env()
+    from google import genai  # imported for the side effect of loading the SDK
+    return genai
+
+
+_provider_lock = threading.Lock()
+
+
+def make_provider(config):
+    name = config.get('LLM_PROVIDER', 'gemini')
+    if name == 'stub':
+        return StubProvider(latency=config.get('LLM_STUB_LATENCY', 0.0))
+    if name == 'gemini':
+        load_env()
+        return GeminiProvider(
+            model=config.get('LLM_MODEL', 'gemini-2.5-flash'),
+            timeout=config.get('LLM_TIMEOUT', 30),
+            retries=config.get('LLM_RETRIES', 2),
+            backoff=config.get('LLM_BACKOFF', 0.5),
+            max_concurrency=config.get('LLM_MAX_CONCURRENCY', 8)
+        )
+    raise ValueError(f'Unknown LLM provider {name!r}')
+
+
+def get_provider():
+    """The current app's provider; created once, on the first LLM-backed request."""
+    provider = current_app.extensions.get('llm_provider')
+    if provider is None:
+        with _provider_lock:
+            provider = current_app.extensions.get('llm_provider')
+            if provider is None:
+                provider = current_app.extensions['llm_provider'] = make_provider(current_app.config)
+    return provider
@@ -0,0 +1,240 @@
+"""Pulling JSON out of LLM replies as they stream in, and checking its shape.
+
+Models wrap JSON in code fences, preambles and trailing prose. `JsonExtractor`
+is fed the reply chunk by chunk and skips everything up to the first
+balanced JSON value of the expected type that fits the schema, so stray
+brackets in the prose ("here are [3] goals") are passed over and nothing
+after the value matters (the rest of the stream isn't even read). It also hands back array elements as soon as each one
+closes (those of a root array, or of named arrays in a root object), so
+callers can act on the first goal or action while the model is still
+writing the last.
+
+Schemas are dicts of field name -> Field; `validate` returns a cleaned
+copy (defaults filled, strings trimmed to their column sizes, numbers
+clamped) or raises SchemaError.
+"""
+import json
+import re
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class Field:
+    def __init__(self, kind, required=True, default=None, max_length=None, choices=None,
+                 bounds=None, items=None):
+        self.kind = kind  # str, int, list, or a nested schema dict
+        self.required = required
+        self.default = default
+        self.max_length = max_length
+        self.choices = choices
+        self.bounds = bounds  # (low, high) for ints
+        self.items = items  # Field for list elements
+
+
+def _clean(value, field, name):
+    if isinstance(field.kind, dict):
+        return validate(value, field.kind)
+    if field.kind is list:
+        if not isinstance(value, list):
+            raise SchemaError(f'{name} must be a list')
+        return [_clean(v, field.items, name) for v in value]
+    if field.kind is int:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise SchemaError(f'{name} must be an integer')
+        if field.bounds:
+            value = min(max(value, field.bounds[0]), field.bounds[1])
+        return value
+    if isinstance(value, (dict, list)) or value is None:
+        raise SchemaError(f'{name} must be a string')
+    value = str(value).strip()
+    if field.choices and value not in field.choices:
+        if field.default is None:
+            raise SchemaError(f'{name} must be one of {", ".join(field.choices)}')
+        value = field.default
+    return value[:field.max_length] if field.max_length else value
+
+
+def validate(value, schema):
+    if not isinstance(value, dict):
+        raise SchemaError('expected an object')
+    cleaned = {}
+    for name, field in schema.items():
+        if value.get(name) in (None, ''):
+            if field.required:
+                raise SchemaError(f'{name} is required')
+            cleaned[name] = field.default
+            continue
+        cleaned[name] = _clean(value[name], field, name)
+    return cleaned
+
+
+# Sized to the Goal columns; points as the goal prompt asks
+GOAL = {
+    'title': Field(str, max_length=150),
+    'description': Field(str, required=False, default='', max_length=300),
+    'category': Field(str, required=False, default='general', max_length=50),
+    'points': Field(int, required=False, default=10, bounds=(10, 30)),
+}
+
+PRIORITY_ACTION = {
+    'title': Field(str),
+    'impact': Field(str, required=False, default='Medium', choices=('High', 'Medium', 'Low')),
+    'effort': Field(str, required=False, default='Medium'),
+    'co2Savings': Field(str, required=False, default=''),
+    'description': Field(str, required=False, default=''),
+}
+
+RECOMMENDATION_CATEGORY = {
+    'category': Field(str),
+    'tips': Field(list, items=Field(str)),
+}
+
+RECOMMENDATIONS = {
+    'priority_actions': Field(list, items=Field(PRIORITY_ACTION)),
+    'recommendations': Field(list, items=Field(RECOMMENDATION_CATEGORY)),
+}
+
+
+class JsonExtractor:
+    """Incremental scanner for the first balanced JSON object or array in a text stream.
+
+    `expect` is the root's type (list or dict). With `schema`, a root
+    object must validate against it, and a root array must have at least
+    one element that does. A closed value that fails either check is
+    dropped and the scan goes on from its next bracket; elements already
+    handed back from it stay handed back, so callers validate those too.
+
+    With `keys`, the root is expected to be an object and the elements of
+    its arrays under those keys are handed back as (key, element) pairs;
+    without, the elements of a root array are handed back as they are.
+    """
+
+    _key = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+
+    def __init__(self, expect=list, keys=None, schema=None):
+        self.expect = dict if keys else expect
+        self.keys = keys
+        self.schema = schema
+        self.text = ''
+        self.value = None
+        self.complete = False
+        self._pos = 0
+        self._level = 2 if keys else 1  # depth at which handed-back elements sit
+        self._reset()
+
+    def _reset(self, start=None):
+        self._start = start  # index of the root's opening bracket
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = None  # set while inside an array whose elements are handed back
+        self._array_key = None
+
+    def feed(self, chunk):
+        """Add text; returns the elements (parsed) that closed in this chunk."""
+        if self.complete:
+            return []
+        self.text += chunk
+        closed = []
+        text = self.text
+        while self._pos < len(text):
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+            if self._start is None:
+                if ch in '{[':
+                    self._reset(i)
+                    self._depth = 1
+                    if ch == '[' and not self.keys:
+                        self._element_start = i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+                if ch == '[' and self.keys and self._depth == 2 and text[self._start] == '{':
+                    match = self._key.search(text, max(self._start, i - 200), i)
+                    if match and match.group(1) in self.keys:
+                        self._array_key = match.group(1)
+                        self._element_start = i + 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._element_start is not None:
+                    if self._depth == self._level:
+                        closed += self._element(i + 1)  # an object/array element just closed
+                    elif self._depth == self._level - 1:
+                        closed += self._element(i)  # the array itself closed
+                        self._element_start = None
+                if self._depth == 0:
+                    if self._finish(i):
+                        return closed
+                    closed = []
+            elif ch == ',' and self._element_start is not None and self._depth == self._level:
+                closed += self._element(i)
+                self._element_start = i + 1
+        return closed
+
+    def _element(self, end):
+        piece = self.text[self._element_start:end].strip()
+        self._element_start = end
+        if not piece:
+            return []
+        try:
+            value = json.loads(piece)
+        except json.JSONDecodeError:
+            return []
+        return [(self._array_key, value)] if self.keys else [value]
+
+    def _finish(self, end):
+        try:
+            value = json.loads(self.text[self._start:end + 1])
+        except json.JSONDecodeError:
+            value = None
+        if not self._acceptable(value):
+            # Brackets in prose ("see [1]"): look for the real value after this one
+            self._pos = self._start + 1
+            self._reset()
+            return False
+        self.value = value
+        self.complete = True
+        return True
+
+    def _acceptable(self, value):
+        if not isinstance(value, self.expect):
+            return False
+        if self.schema is None:
+            return True
+        for item in value if isinstance(value, list) else [value]:
+            try:
+                validate(item, self.schema)
+                return True
+            except SchemaError:
+                pass
+        return False
+
+
+def extract_json(chunks, expect=dict, schema=None):
+    """The first fitting JSON value in a stream of text chunks; stops reading once it closes.
+
+    Raises SchemaError (with `.raw` holding what was read) if there is none.
+    """
+    extractor = JsonExtractor(expect, schema=schema)
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.complete:
+            return extractor.value
+    error = SchemaError('no JSON value in the response')
+    error.raw = extractor.text
+    raise error
@@ -0,0 +1,73 @@
+"""Structured, sampled, non-blocking logging for the 'ecometer' loggers.
+
+Records are JSON lines with the message, level, logger and any
+`extra={'fields': {...}}`. Request threads only put records on a queue;
+a listener thread does the actual writing, so a slow stderr/pipe never
+holds up a request. DEBUG/INFO records are kept with probability
+LOG_SAMPLE_RATE; warnings and errors are always kept.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+
+ROOT = 'ecometer'
+
+
+def get_logger(name):
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Let through every WARNING and above, and `rate` of everything else."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+_handler = None
+
+
+def configure_logging(app):
+    """Route the app's loggers through a queue to stderr, once per process."""
+    global _handler
+    logger = logging.getLogger(ROOT)
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+    sample = SampleFilter(app.config.get('LOG_SAMPLE_RATE', 1.0))
+    if _handler is not None:
+        # Filters on a logger don't see its children's records, so sampling sits on the handler
+        _handler.filters = [sample]
+        return
+
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter())
+    _handler = logging.handlers.QueueHandler(records)
+    _handler.addFilter(sample)
+    logger.addHandler(_handler)
+    listener = logging.handlers.QueueListener(records, stream)
+    listener.start()
+    atexit.register(listener.stop)  # flush what's queued on shutdown
@@ -0,0 +1,170 @@
+"""Per-endpoint request, SQL and LLM timings, exposed in Prometheus text format.
+
+`init_metrics(app)` hooks SQLAlchemy engine events (every statement's
+duration) and Flask request hooks (total latency), and attributes both to
+the request's endpoint; work outside a request (background jobs) is
+counted under 'background'. Providers report LLM time with `record_llm`.
+Figures are kept per process: behind several workers each one serves its
+own /metrics.
+
+Statements slower than SLOW_QUERY_MS and requests slower than
+SLOW_REQUEST_MS are logged as warnings on the 'ecometer.slow' logger.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request, has_app_context, has_request_context
+from sqlalchemy import event
+
+from extensions import db
+from services.logs import get_logger
+
+# Upper bounds in seconds for the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = get_logger('slow')
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.latency = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+        self.db = {}  # endpoint -> [statements, seconds]
+        self.llm = {}  # endpoint -> [calls, seconds]
+        self.slow_queries = 0
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.latency.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            hist[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            hist[-1] += seconds
+
+    def observe_query(self, endpoint, seconds, slow):
+        with self._lock:
+            stats = self.db.setdefault(endpoint, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            self.slow_queries += slow
+
+    def observe_llm(self, endpoint, seconds):
+        with self._lock:
+            stats = self.llm.setdefault(endpoint, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+
+    def render(self):
+        """Everything recorded so far in Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('ecometer_requests_total', 'counter', 'HTTP requests by endpoint, method and status.')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'ecometer_requests_total{{endpoint="{endpoint}",method="{method}",'
+                             f'status="{status}"}} {count}')
+
+            family('ecometer_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+            for endpoint, hist in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), hist[:-1]):
+                    cumulative += count
+                    lines.append(f'ecometer_request_duration_seconds_bucket{{endpoint="{endpoint}",'
+                                 f'le="{bound}"}} {cumulative}')
+                lines.append(f'ecometer_request_duration_seconds_sum{{endpoint="{endpoint}"}} {hist[-1]:.6f}')
+                lines.append(f'ecometer_request_duration_seconds_count{{endpoint="{endpoint}"}} {cumulative}')
+
+            for name, source, unit, help_text in (
+                ('ecometer_db_queries_total', self.db, 0, 'SQL statements executed, by endpoint.'),
+                ('ecometer_db_seconds_total', self.db, 1, 'Time spent in SQL statements, by endpoint.'),
+                ('ecometer_llm_calls_total', self.llm, 0, 'LLM calls, by endpoint.'),
+                ('ecometer_llm_seconds_total', self.llm, 1, 'Time spent waiting on the LLM, by endpoint.'),
+            ):
+                family(name, 'counter', help_text)
+                for endpoint, stats in sorted(source.items()):
+                    value = stats[unit]
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value:.6f}' if unit else
+                                 f'{name}{{endpoint="{endpoint}"}} {value}')
+
+            family('ecometer_slow_queries_total', 'counter', 'SQL statements slower than SLOW_QUERY_MS.')
+            lines.append(f'ecometer_slow_queries_total {self.slow_queries}')
+        return '\n'.join(lines) + '\n'
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+
+def _current():
+    """The app's Metrics, or None outside an app or with metrics turned off."""
+    if not has_app_context():
+        return None
+    from flask import current_app
+    return current_app.extensions.get('metrics')
+
+
+def record_llm(seconds):
+    metrics = _current()
+    if metrics is None:
+        return
+    metrics.observe_llm(_endpoint(), seconds)
+    if has_request_context() and 'metrics' in g:
+        g.metrics['llm_seconds'] += seconds
+
+
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    metrics = app.extensions['metrics'] = Metrics()
+    slow_query = app.config.get('SLOW_QUERY_MS', 200) / 1000
+    slow_request = app.config.get('SLOW_REQUEST_MS', 1000) / 1000
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        endpoint = _endpoint()
+        slow = elapsed >= slow_query
+        metrics.observe_query(endpoint, elapsed, slow)
+        if has_request_context() and 'metrics' in g:
+            g.metrics['queries'] += 1
+            g.metrics['db_seconds'] += elapsed
+        if slow:
+            slow_log.warning('slow query', extra={'fields': {
+                'endpoint': endpoint, 'ms': round(elapsed * 1000, 1),
+                'statement': ' '.join(statement.split())[:500], 'executemany': executemany,
+            }})
+
+    @app.before_request
+    def start_request():
+        g.metrics = {'start': time.perf_counter(), 'queries': 0, 'db_seconds': 0.0, 'llm_seconds': 0.0}
+
+    @app.after_request
+    def end_request(response):
+        stats = g.pop('metrics', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats['start']
+        endpoint = _endpoint()
+        metrics.observe_request(endpoint, request.method, response.status_code, elapsed)
+        if elapsed >= slow_request:
+            slow_log.warning('slow request', extra={'fields': {
+                'endpoint': endpoint, 'method': request.method, 'path': request.path,
+                'status': response.status_code, 'ms': round(elapsed * 1000, 1),
+                'queries': stats['queries'], 'db_ms': round(stats['db_seconds'] * 1000, 1),
+                'llm_ms': round(stats['llm_seconds'] * 1000, 1),
+            }})
+        return response
@@ -0,0 +1,210 @@
+"""Template goals and recommendations, chosen locally without an LLM.
+
+Each category's average per logged day is placed in a band (low, medium, high)
+against typical values; the catalogue below holds goals and tips per
+(category, band) and is indexed once at import. Output has the same
+shape as the LLM's, so it can stand in wherever that is used: as the
+fallback when the LLM fails (ADVICE_FALLBACK), instead of queueing when
+every LLM slot is busy (ADVICE_SHED_LOAD), or as the only engine with
+ADVICE_ENGINE = 'offline'. The same summary always gives the same answer.
+"""
+from flask import current_app
+
+from services.emissions import CATEGORIES
+from services.llm import get_provider
+
+BANDS = ('low', 'medium', 'high')
+
+# kg CO2 per day: (top of low, bottom of high), around the factor table's typical day
+BAND_LIMITS = {
+    'travel': (2.0, 8.0),
+    'food': (4.0, 9.0),
+    'waste': (1.0, 3.0),
+    'electricity': (15.0, 35.0),
+}
+
+POINTS = {'low': 10, 'medium': 20, 'high': 30}
+IMPACT = {'low': 'Low', 'medium': 'Medium', 'high': 'High'}
+
+# Recommendation sections, in the order the LLM prompt asks for them
+SECTIONS = (
+    ('Transportation', 'travel'),
+    ('Food & Diet', 'food'),
+    ('Energy Usage', 'electricity'),
+    ('Waste Reduction', 'waste'),
+)
+
+# (title, description, effort, share of the category's daily emissions it saves);
+# descriptions may use {daily} (kg/day now) and {saving} (kg/day saved)
+_GOALS = {
+    ('travel', 'high'): [
+        ('Swap two car commutes for transit', 'Travel averages {daily} kg CO2 a day. Taking the bus or train '
+         'twice this week saves about {saving} kg a day.', 'Medium', 0.3),
+        ('Combine errands into one trip', 'Plan the week\'s errands into a single drive instead of several '
+         'short ones; cold starts burn the most fuel.', 'Low', 0.15),
+    ],
+    ('travel', 'medium'): [
+        ('Walk or cycle trips under 3 km', 'Short hops are the easiest travel emissions to cut; replacing '
+         'them saves about {saving} kg a day.', 'Low', 0.2),
+        ('Car-share one commute a week', 'Sharing a ride halves that trip\'s emissions.', 'Low', 0.1),
+    ],
+    ('travel', 'low'): [
+        ('Keep your low-carbon travel streak', 'Travel is only {daily} kg CO2 a day. Keep walking, cycling '
+         'and riding transit this week.', 'Low', 0.05),
+    ],
+    ('food', 'high'): [
+        ('Go meat-free three days this week', 'Food averages {daily} kg CO2 a day. Plant-based days save '
+         'about {saving} kg a day.', 'Medium', 0.3),
+        ('Replace beef with chicken or beans', 'Beef has several times the footprint of other proteins.',
+         'Low', 0.2),
+    ],
+    ('food', 'medium'): [
+        ('Try one plant-based dinner a day', 'Swapping one meal a day saves about {saving} kg CO2.', 'Low', 0.15),
+        ('Plan meals to avoid food waste', 'Buy only what the week\'s plan needs and use leftovers first.',
+         'Low', 0.1),
+    ],
+    ('food', 'low'): [
+        ('Cook with seasonal, local produce', 'Your food footprint is already low at {daily} kg a day; '
+         'seasonal produce keeps it there.', 'Low', 0.05),
+    ],
+    ('waste', 'high'): [
+        ('Start composting food scraps', 'Waste averages {daily} kg CO2 a day. Composting keeps organics out '
+         'of landfill and saves about {saving} kg a day.', 'Medium', 0.35),
+        ('Refuse single-use packaging', 'Bring bags, bottles and containers for a week.', 'Low', 0.2),
+    ],
+    ('waste', 'medium'): [
+        ('Sort every recyclable this week', 'Rinse and separate paper, glass, metal and plastic.', 'Low', 0.2),
+        ('Buy in bulk for staples', 'Fewer packages for the same food saves about {saving} kg a day.',
+         'Low', 0.1),
+    ],
+    ('waste', 'low'): [
+        ('Repair before you replace', 'Waste is low at {daily} kg a day; fixing one broken item keeps it '
+         'that way.', 'Low', 0.05),
+    ],
+    ('electricity', 'high'): [
+        ('Turn the thermostat 1°C toward outdoors', 'Electricity averages {daily} kg CO2 a day. '
+         'Heating and cooling less saves about {saving} kg a day.', 'Low', 0.1),
+        ('Run full loads on cold wash', 'Washing at 30°C and skipping the dryer cuts laundry energy '
+         'by more than half.', 'Low', 0.08),
+    ],
+    ('electricity', 'medium'): [
+        ('Switch off standby devices at night', 'Standby power adds up; a power strip makes it one switch '
+         'and saves about {saving} kg a day.', 'Low', 0.05),
+        ('Replace your most-used bulbs with LEDs', 'LEDs use about a fifth of the energy of incandescents.',
+         'Low', 0.04),
+    ],
+    ('electricity', 'low'): [
+        ('Unplug chargers when not in use', 'Electricity is low at {daily} kg a day. Small habits keep it '
+         'there.', 'Low', 0.02),
+    ],
+}
+
+_TIPS = {
+    'travel': {
+        'high': ['Take public transport for your regular commute', 'Work from home one day a week if you can',
+                 'Keep tyres inflated to cut fuel use', 'Consider an electric or hybrid car for your next vehicle'],
+        'medium': ['Walk or cycle for short trips', 'Combine errands into one trip', 'Car-share to work',
+                   'Drive smoothly: hard acceleration wastes fuel'],
+        'low': ['Keep choosing walking, cycling and transit', 'Take the train instead of short flights',
+                'Service your bike so it stays the easy option'],
+    },
+    'food': {
+        'high': ['Make three days a week meat-free', 'Choose chicken or legumes over beef and lamb',
+                 'Cut back on cheese and dairy', 'Plan meals so nothing goes to waste'],
+        'medium': ['Eat one plant-based meal a day', 'Buy seasonal, local produce', 'Freeze leftovers for later',
+                   'Store food properly so it lasts longer'],
+        'low': ['Keep your plant-rich diet going', 'Grow herbs or vegetables at home',
+                'Share surplus food with neighbours'],
+    },
+    'electricity': {
+        'high': ['Set the thermostat 1°C lower in winter and higher in summer', 'Wash laundry at 30°C',
+                 'Air-dry clothes instead of using the dryer', 'Switch to a renewable electricity tariff'],
+        'medium': ['Turn off devices at the wall at night', 'Replace remaining bulbs with LEDs',
+                   'Only boil the water you need', 'Keep the fridge at 3-5°C'],
+        'low': ['Unplug chargers when not in use', 'Use natural light during the day',
+                'Choose efficient appliances when replacing old ones'],
+    },
+    'waste': {
+        'high': ['Compost food scraps', 'Carry a reusable bag, bottle and cup', 'Avoid single-use packaging',
+                 'Sort recyclables carefully'],
+        'medium': ['Buy staples in bulk', 'Choose products with recyclable packaging', 'Repair before replacing',
+                   'Donate items you no longer use'],
+        'low': ['Keep refusing single-use items', 'Buy second-hand where you can', 'Share tools with neighbours'],
+    },
+}
+
+# Precompiled index: (category, band) -> goal templates, and -> tips
+GOALS = {key: tuple(templates) for key, templates in _GOALS.items()}
+TIPS = {(c, band): tuple(tips) for c, by_band in _TIPS.items() for band, tips in by_band.items()}
+
+
+def band(category, daily):
+    low, high = BAND_LIMITS[category]
+    return 'low' if daily < low else 'high' if daily >= high else 'medium'
+
+
+def _profile(summary, days):
+    """[(category, daily kg, band)] with the categories furthest above typical first.
+
+    Daily figures are per day actually logged when the summary carries
+    `entries` (as window_totals does), so occasional loggers aren't read
+    as low emitters; otherwise they are spread over the `days` window.
+    """
+    logged = max(summary['entries'] or 0, 1) if 'entries' in summary else days
+    rows = []
+    for c in CATEGORIES:
+        daily = max(summary.get(c) or 0, 0) / logged
+        rows.append((c, daily, band(c, daily)))
+    return sorted(rows, key=lambda r: (-r[1] / sum(BAND_LIMITS[r[0]]), r[0]))
+
+
+def _pick(options, summary, offset=0):
+    # Deterministic variety: the same summary always picks the same template
+    seed = int(sum(summary.get(c) or 0 for c in CATEGORIES) * 10)
+    return options[(seed + offset) % len(options)]
+
+
+def offline_goals(summary, days=14, count=3):
+    """Goal dicts (title, description, category, points) for a `days`-day category summary."""
+    goals = []
+    for i, (c, daily, b) in enumerate(_profile(summary, days)[:count]):
+        title, description, _, share = _pick(GOALS[(c, b)], summary, i)
+        goals.append({
+            'title': title,
+            'description': description.format(daily=f'{daily:.1f}', saving=f'{daily * share:.1f}'),
+            'category': c,
+            'points': POINTS[b],
+        })
+    return goals
+
+
+def offline_recommendations(summary, days=30):
+    """The recommendations payload (priority_actions and recommendations) for a summary."""
+    profile = _profile(summary, days)
+    actions = []
+    for i, (c, daily, b) in enumerate(profile[:3]):
+        title, description, effort, share = _pick(GOALS[(c, b)], summary, i)
+        actions.append({
+            'title': title,
+            'impact': IMPACT[b],
+            'effort': effort,
+            'co2Savings': f'{daily * share:.1f} kg/day',
+            'description': description.format(daily=f'{daily:.1f}', saving=f'{daily * share:.1f}'),
+        })
+    bands = {c: b for c, _, b in profile}
+    return {
+        'priority_actions': actions,
+        'recommendations': [{'category': name, 'tips': list(TIPS[(c, bands[c])])} for name, c in SECTIONS],
+    }
+
+
+def use_offline():
+    """True when advice should come from the templates without trying the LLM."""
+    config = current_app.config
+    if config.get('ADVICE_ENGINE', 'llm') == 'offline':
+        return True
+    return config.get('ADVICE_SHED_LOAD', True) and get_provider().saturated()
+
+
+def fallback_enabled():
+    return current_app.config.get('ADVICE_FALLBACK', True)
@@ -0,0 +1,115 @@
+"""EXPLAIN QUERY PLAN checks for the queries each blueprint runs on its hot path.
+
+Run with `flask --app app explain-queries`; it exits non-zero if any query
+scans a whole table. Each entry calls the statement builder the route or
+service itself executes, with representative parameters, so the audit
+follows the code. Primary-key gets (db.session.get) aren't listed.
+"""
+from extensions import db
+from datetime import date, datetime, timedelta
+from services import goal_list, leaderboard
+from services.badges import catalog_stmt, held_badges_stmt
+from services.cohorts import cohort_bins_stmt, histogram_stmt
+from services.export import export_stmt, _after
+from services.goal_sweep import due_users_stmt
+from services.ingest import existing_days_stmt
+from services.rollups import (series_stmt, existing_buckets_stmt, daily_rows_stmt, window_totals_stmt,
+                              window_totals_many_stmt)
+from routes.auth import user_by_username_stmt
+from routes.data import entry_for_day_stmt
+from routes.goals import owned_goal_stmt, latest_goal_stmt
+from routes.rewards import user_badges_stmt
+from models import Goal
+
+# Tiny, fixed-size catalog tables that are fine to read in full
+SCAN_ALLOWED = {'badge'}
+
+_today = date(2024, 1, 31)
+
+
+def hot_queries():
+    month = _today.replace(day=1)
+    return {
+        'auth': [
+            ('signup/login: user by username', user_by_username_stmt('a@b.c')),
+        ],
+        'data': [
+            ('add: existing entry for today', entry_for_day_stmt(1, _today)),
+            ('bulk: existing days in chunk', existing_days_stmt(
+                [1, 2, 3], _today - timedelta(days=30), _today)),
+            ('rollups: existing buckets', existing_buckets_stmt([1, 2, 3], {
+                'day': (_today - timedelta(days=3), _today), 'month': (month, month)})),
+            ('chart: daily buckets', daily_rows_stmt(1, _today - timedelta(days=30))),
+            ('chart series: monthly over two years', series_stmt(
+                1, _today - timedelta(days=730), _today, 'month')),
+            ('chart series: weekly', series_stmt(1, _today - timedelta(days=90), _today, 'week')),
+            ('peers: cohort histogram', histogram_stmt('urban', 2)),
+            ('ingest: cohort bins', cohort_bins_stmt({('urban', 1), ('rural', 2)})),
+            ('recommendations: window totals', window_totals_stmt(1, _today - timedelta(days=30), _today)),
+        ],
+        'goals': [
+            ('list goals for user', goal_list.all_goals_stmt(1)),
+            ('goals page', goal_list.page_stmt(
+                1, 21, goal_list.encode_cursor(datetime(2024, 1, 1), 50), status='pending',
+                fields=('id', 'title'))),
+            ('goals etag', goal_list.fingerprint_stmt(1)),
+            ('complete: goal owned by user', owned_goal_stmt(1, 1, Goal.points, Goal.completed)),
+            ('latest generated goal', latest_goal_stmt(1)),
+            ('sweep: due users', due_users_stmt(0, datetime(2024, 1, 1), 500)),
+            ('sweep: window totals for batch', window_totals_many_stmt(
+                [1, 2, 3], _today - timedelta(days=14), _today)),
+        ],
+        'export': [
+            (f'{kind}{" for user" if user_id else ""}: next batch', stmt.where(
+                _after(order, (_today,) if order[0].key == 'date' else (1,))).limit(1000))
+            for kind in ('daily_data', 'goals', 'badges') for user_id in (1, None)
+            for stmt, order in [export_stmt(kind, user_id)]
+        ],
+        'rewards': [
+            ('badges for user', user_badges_stmt(1)),
+            ('award: badges already held', held_badges_stmt(1, [1, 2])),
+            ('catalog load', catalog_stmt()),
+            ('leaderboard page', leaderboard.page_stmt(6, leaderboard.encode_cursor(500, 7))),
+            ('leaderboard rank', leaderboard.rank_stmt(500)),
+            ('leaderboard ties', leaderboard.ties_stmt(500)),
+        ],
+    }
+
+
+def explain(stmt):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    compiled = stmt.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(
+        v.isoformat() if hasattr(v, 'isoformat') else v
+        for v in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan, bounded=False):
+    """Plan lines that read a whole table.
+
+    With `bounded` (the statement has a LIMIT), walking an index in order is
+    accepted since SQLite stops after the limit.
+    """
+    scans = []
+    for line in plan:
+        if not line.startswith('SCAN '):
+            continue
+        table = line.split()[1]
+        if bounded and ' USING ' in line and 'INDEX' in line:
+            continue
+        if table in db.metadata.tables and table not in SCAN_ALLOWED:
+            scans.append(line)
+    return scans
+
+
+def audit():
+    """Yield (blueprint, label, plan, full_scans) for every hot query."""
+    for blueprint, queries in hot_queries().items():
+        for label, stmt in queries:
+            plan = explain(stmt)
+            bounded = getattr(stmt, '_limit_clause', None) is not None
+            yield blueprint, label, plan, full_scans(plan, bounded)
@@ -0,0 +1,264 @@
+from extensions import db, increment_rows
+from models import DailyData, EmissionRollup
+from datetime import timedelta
+from sqlalchemy import or_, and_, select, func, cast, Date
+
+CATEGORIES = ('travel', 'food', 'waste', 'electricity')
+PERIODS = ('day', 'week', 'month')
+CHART_BUCKETS = ('day', 'week', 'month', 'year')
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())  # weeks start on Monday
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def existing_buckets_stmt(user_ids, ranges):
+    """Keys of the rollup rows for these users whose start lies in each period's (low, high) range."""
+    return select(
+        EmissionRollup.user_id, EmissionRollup.period, EmissionRollup.period_start
+    ).where(or_(*(
+        # user_id repeated per branch so each one is a full index range seek
+        and_(EmissionRollup.user_id.in_(user_ids), EmissionRollup.period == period,
+             EmissionRollup.period_start.between(low, high))
+        for period, (low, high) in ranges.items()
+    )))
+
+
+def apply_deltas(deltas):
+    """Add per-day changes into every day/week/month bucket they fall in.
+
+    `deltas` is an iterable of dicts with user_id, date, the four categories
+    and `entries` (+1 for a new day, 0 when an existing day is overwritten).
+    Existing buckets are incremented in SQL so concurrent writers don't lose
+    each other's updates. Does not commit.
+    """
+    buckets = {}
+    for d in deltas:
+        for period in PERIODS:
+            key = (d['user_id'], period, period_start(period, d['date']))
+            bucket = buckets.setdefault(key, dict.fromkeys(CATEGORIES + ('entries',), 0))
+            for c in CATEGORIES:
+                bucket[c] += d[c]
+            bucket['entries'] += d.get('entries', 0)
+    if not buckets:
+        return
+
+    # Same range-then-match approach as ingest.upsert_chunk, see the note there
+    ranges = {}
+    for _, period, start in buckets:
+        low, high = ranges.get(period, (start, start))
+        ranges[period] = (min(low, start), max(high, start))
+    user_ids = sorted({user_id for user_id, _, _ in buckets})
+    increment_rows(EmissionRollup, ('user_id', 'period', 'period_start'), buckets,
+                   existing_buckets_stmt(user_ids, ranges))
+
+
+def record_entry(user_id, day, emissions, previous=None):
+    """Roll up one DailyData write; pass the old values when overwriting a day."""
+    delta = {c: emissions[c] - (previous[c] if previous else 0) for c in CATEGORIES}
+    apply_deltas([dict(delta, user_id=user_id, date=day, entries=0 if previous else 1)])
+
+
+def _window_buckets(start, end):
+    """Cover [start, end] with as few aligned month/week/day buckets as possible."""
+    day = start
+    while day <= end:
+        if day.day == 1 and _next_month(day) - timedelta(days=1) <= end:
+            yield 'month', day
+            day = _next_month(day)
+        elif day.weekday() == 0 and day + timedelta(days=6) <= end:
+            yield 'week', day
+            day += timedelta(days=7)
+        else:
+            yield 'day', day
+            day += timedelta(days=1)
+
+
+def _window_filter(start, end):
+    by_period = {}
+    for period, bucket_start in _window_buckets(start, end):
+        by_period.setdefault(period, []).append(bucket_start)
+    if not by_period:
+        return None
+    return or_(*(
+        and_(EmissionRollup.period == period, EmissionRollup.period_start.in_(starts))
+        for period, starts in by_period.items()
+    ))
+
+
+def window_totals_stmt(user_id, start, end):
+    """The rollup rows covering [start, end] for a user; None for an empty window."""
+    window = _window_filter(start, end)
+    if window is None:
+        return None
+    return select(EmissionRollup).where(EmissionRollup.user_id == user_id, window)
+
+
+def window_totals(user_id, start, end):
+    """Per-category totals and entry count for a user between two dates, inclusive."""
+    totals = dict.fromkeys(CATEGORIES + ('entries',), 0)
+    stmt = window_totals_stmt(user_id, start, end)
+    if stmt is None:
+        return totals
+
+    rows = db.session.scalars(stmt).all()
+    for row in rows:
+        for k in totals:
+            totals[k] += getattr(row, k)
+    return totals
+
+
+def window_totals_many_stmt(user_ids, start, end):
+    """Per-user sums over the rollup rows covering [start, end]; None for an empty window."""
+    window = _window_filter(start, end)
+    if window is None:
+        return None
+    return select(
+        EmissionRollup.user_id, *(func.sum(getattr(EmissionRollup, k)).label(k) for k in CATEGORIES + ('entries',))
+    ).where(EmissionRollup.user_id.in_(user_ids), window).group_by(EmissionRollup.user_id)
+
+
+def window_totals_many(user_ids, start, end):
+    """window_totals for many users in one aggregate query: {user_id: totals}.
+
+    Users with nothing logged in the window are left out.
+    """
+    stmt = window_totals_many_stmt(user_ids, start, end)
+    if stmt is None or not user_ids:
+        return {}
+    columns = CATEGORIES + ('entries',)
+    rows = db.session.execute(stmt)
+    return {row.user_id: {k: getattr(row, k) for k in columns} for row in rows if row.entries}
+
+
+def daily_rows_stmt(user_id, start):
+    return select(EmissionRollup).where(
+        EmissionRollup.user_id == user_id,
+        EmissionRollup.period == 'day',
+        EmissionRollup.period_start >= start
+    ).order_by(EmissionRollup.period_start)
+
+
+def daily_rows(user_id, start):
+    return db.session.scalars(daily_rows_stmt(user_id, start)).all()
+
+
+def _bucket_key(column, bucket):
+    """SQL expression giving the start date of the chart bucket a rollup row falls in."""
+    if db.engine.dialect.name == 'sqlite':
+        if bucket == 'year':
+            return func.strftime('%Y-01-01', column)
+        if bucket == 'month':
+            return func.strftime('%Y-%m-01', column)
+        if bucket == 'week':
+            return func.date(column, '-6 days', 'weekday 1')  # back to Monday
+        return func.date(column)
+    if bucket == 'day':
+        return column
+    return cast(func.date_trunc(bucket, column), Date)
+
+
+def _series_sources(start, end, bucket):
+    """(period, first, last) rollup ranges that together cover [start, end] exactly.
+
+    Whole weeks/months inside the range come from their own rollups, the
+    ragged edges from day rows; a year is built from months.
+    """
+    if bucket == 'day':
+        return [('day', start, end)]
+    period = 'week' if bucket == 'week' else 'month'
+    after_end = end + timedelta(days=1)
+    if period == 'week':
+        first = start + timedelta(days=-start.weekday() % 7)
+        stop = after_end - timedelta(days=after_end.weekday())
+    else:
+        first = start if start.day == 1 else _next_month(start)
+        stop = after_end.replace(day=1)
+    if first >= stop:
+        return [('day', start, end)]
+    sources = [(period, first, stop - timedelta(days=1))]
+    if start < first:
+        sources.append(('day', start, first - timedelta(days=1)))
+    if stop <= end:
+        sources.append(('day', stop, end))
+    return sources
+
+
+def series_stmt(user_id, start, end, bucket='day'):
+    """GROUP BY query for one user's per-bucket totals between two dates, inclusive."""
+    key = _bucket_key(EmissionRollup.period_start, bucket).label('bucket')
+    sums = [func.sum(getattr(EmissionRollup, c)).label(c) for c in CATEGORIES]
+    return (
+        select(key, *sums, func.sum(EmissionRollup.entries).label('entries'))
+        .where(EmissionRollup.user_id == user_id, or_(*(
+            and_(EmissionRollup.period == period, EmissionRollup.period_start.between(low, high))
+            for period, low, high in _series_sources(start, end, bucket)
+        )))
+        .group_by(key)
+        .order_by(key)
+    )
+
+
+def _bucket_starts(start, end, bucket='day'):
+    """Start dates of every chart bucket from the one holding `start` to the one holding `end`."""
+    if bucket == 'week':
+        day, step = start - timedelta(days=start.weekday()), lambda d: d + timedelta(days=7)
+    elif bucket == 'month':
+        day, step = start.replace(day=1), _next_month
+    elif bucket == 'year':
+        day, step = start.replace(month=1, day=1), lambda d: d.replace(year=d.year + 1)
+    else:
+        day, step = start, lambda d: d + timedelta(days=1)
+    while day <= end:
+        yield day
+        day = step(day)
+
+
+def series(user_id, start, end, bucket='day'):
+    """Columnar per-bucket totals: parallel lists keyed by column, one entry per bucket.
+
+    Buckets with no data come back as zeros, so the dates are contiguous.
+    """
+    rows = {str(row.bucket)[:10]: row for row in db.session.execute(series_stmt(user_id, start, end, bucket))}
+    columns = {k: [] for k in ('dates',) + CATEGORIES + ('total', 'entries')}
+    for day in _bucket_starts(start, end, bucket):
+        label = day.isoformat()
+        row = rows.get(label)
+        values = {c: (getattr(row, c) or 0) if row else 0 for c in CATEGORIES}
+        columns['dates'].append(label)
+        for c in CATEGORIES:
+            columns[c].append(round(values[c], 3))
+        columns['total'].append(round(sum(values.values()), 3))
+        columns['entries'].append(row.entries if row else 0)
+    return columns
+
+
+def rebuild_rollups(batch_size=5000):
+    """Recompute every bucket from DailyData, e.g. for databases that predate rollups."""
+    EmissionRollup.query.delete()
+    db.session.commit()
+
+    last_id = 0
+    rebuilt = 0
+    while True:
+        rows = DailyData.query.filter(DailyData.id > last_id) \
+            .order_by(DailyData.id).limit(batch_size).all()
+        if not rows:
+            break
+        apply_deltas(
+            dict(user_id=r.user_id, date=r.date, entries=1,
+                 **{c: getattr(r, c) or 0 for c in CATEGORIES})
+            for r in rows
+        )
+        db.session.commit()
+        last_id = rows[-1].id
+        rebuilt += len(rows)
+    return rebuilt
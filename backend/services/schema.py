@@ -0,0 +1,116 @@
+from extensions import db
+from models import User, DailyData, UserBadge, CohortBin, EmissionRollup, PointsTally
+from services.rollups import rebuild_rollups
+from services.badges import seed_badges, backfill_badge_progress
+from services.cohorts import refresh_cohorts
+from services.leaderboard import rebuild_points_tally
+from sqlalchemy import inspect, func, text
+
+
+def _add_missing_columns(conn):
+    """ALTER TABLE ADD COLUMN for model columns an older database file lacks."""
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        present = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            ddl = f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(conn.dialect)}'
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if default is not None:
+                ddl += f" DEFAULT {('TRUE' if default else 'FALSE') if isinstance(default, bool) else repr(default)}"
+            conn.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def _widen_columns(conn):
+    """ALTER COLUMN TYPE for string columns the models have since lengthened (e.g. user.password).
+
+    SQLite doesn't enforce declared lengths, so only other dialects need it.
+    """
+    if conn.dialect.name == 'sqlite':
+        return []
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    widened = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        lengths = {c['name']: getattr(c['type'], 'length', None) for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            want, have = getattr(column.type, 'length', None), lengths.get(column.name)
+            if want is None or have is None or have >= want:
+                continue
+            conn.execute(text(f'ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} '
+                              f'TYPE {column.type.compile(conn.dialect)}'))
+            widened.append(f'{table.name}.{column.name}')
+    return widened
+
+
+def _dedupe(model, key_columns, keep=func.min):
+    """Delete rows that would violate a new unique index, keeping one per key."""
+    keepers = db.session.query(keep(model.id)).group_by(*key_columns)
+    duplicates = db.session.query(func.count(model.id)).filter(model.id.notin_(keepers)).scalar()
+    if duplicates:
+        model.query.filter(model.id.notin_(keepers)).delete(synchronize_session=False)
+    return duplicates
+
+
+def upgrade_schema():
+    """Bring an existing database file up to the current models.
+
+    Safe to run repeatedly: creates new tables, adds new columns, removes
+    rows that break new unique indexes and creates any missing indexes.
+    Returns a list of human-readable steps taken.
+    """
+    steps = []
+    db.create_all()
+
+    with db.engine.begin() as conn:
+        added = _add_missing_columns(conn)
+        steps += [f'added column {c}' for c in added]
+        steps += [f'widened column {c}' for c in _widen_columns(conn)]
+
+    # The latest write for a day wins, matching the bulk upsert semantics
+    removed = _dedupe(DailyData, (DailyData.user_id, DailyData.date), keep=func.max)
+    if removed:
+        steps.append(f'removed {removed} duplicate daily_data rows')
+    removed_badges = _dedupe(UserBadge, (UserBadge.user_id, UserBadge.badge_id))
+    if removed_badges:
+        steps.append(f'removed {removed_badges} duplicate user_badge rows')
+    db.session.commit()
+    has_data = db.session.query(DailyData.id).first() is not None
+    # A database that predates rollups gets an empty table from create_all above
+    if removed or (has_data and not db.session.query(EmissionRollup.id).first()):
+        rebuild_rollups()
+        steps.append('rebuilt emission rollups')
+    if removed or (has_data and not db.session.query(CohortBin.id).first()):
+        refresh_cohorts()
+        steps.append('built cohort histograms')
+    if not db.session.query(PointsTally.points).first() and \
+            db.session.query(User.id).filter(User.totalPoints > 0).first():
+        rebuild_points_tally()
+        steps.append('built leaderboard points tally')
+    if 'user.goals_completed' in added:
+        backfill_badge_progress()
+        steps.append('backfilled goal counters and badges')
+    else:
+        seed_badges()
+        db.session.commit()
+
+    with db.engine.begin() as conn:
+        existing = set()
+        inspector = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            existing |= {i['name'] for i in inspector.get_indexes(table.name)}
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    steps.append(f'created index {index.name}')
+    return steps
@@ -0,0 +1,127 @@
+"""Password hashing and signed session tokens.
+
+Passwords are stored as werkzeug hashes using PASSWORD_HASH_METHOD, e.g.
+'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'; `python -m
+benchmarks.password_hash` times the candidates on the serving hardware.
+Rows from before hashing still hold the plaintext and are rehashed on
+that user's next successful login, as are hashes made with an older
+method, so raising the cost needs no migration.
+
+Sessions are stateless: login and signup hand out a token signed with
+SECRET_KEY that carries the user id. `authenticate` checks the signature
+and age in memory, so identifying the caller costs no query. Routes that
+act across users (bulk ingest, full exports) take `require_admin` instead.
+Outside development and testing the app won't start with the fallback
+SECRET_KEY, since anyone could sign tokens with it.
+"""
+import hmac
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import DEV_SECRET_KEY
+
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+TOKEN_SALT = 'ecometer-session'
+
+_dummy_hashes = {}
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES) and stored.count('$') == 2
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(stored, password):
+    """(matches, needs_rehash) for a stored hash or legacy plaintext value."""
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    if not check_password_hash(stored, password):
+        return False, False
+    return True, stored.split('$', 1)[0] != current_app.config['PASSWORD_HASH_METHOD']
+
+
+def reject_unknown_user(password):
+    """Spend as long as a real check, so response time doesn't reveal which usernames exist."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method not in _dummy_hashes:
+        _dummy_hashes[method] = generate_password_hash('', method=method)
+    check_password_hash(_dummy_hashes[method], password)
+    return False
+
+
+def check_security_config(app):
+    """Refuse the public fallback SECRET_KEY outside development/testing; warn when tokens are optional."""
+    if app.debug or app.testing:
+        return
+    if app.config.get('SECRET_KEY') in (None, '', DEV_SECRET_KEY):
+        raise RuntimeError('SECRET_KEY must be set: the fallback key would let anyone forge session tokens')
+    if not app.config['AUTH_REQUIRED']:
+        app.logger.warning('AUTH_REQUIRED is off: routes trust the user_id in the request from callers '
+                           'without a token, so any caller can act as any user')
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def issue_token(user_id):
+    return _serializer().dumps({'uid': user_id})
+
+
+def token_user_id(token):
+    """The user id a token was issued for, or None if it is forged or expired."""
+    try:
+        payload = _serializer().loads(token, max_age=current_app.config['TOKEN_MAX_AGE'])
+    except (SignatureExpired, BadSignature):
+        return None
+    return payload.get('uid')
+
+
+def _bearer():
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token.strip() else None
+
+
+def authenticate(view):
+    """Resolve the caller into `g.user_id` from an `Authorization: Bearer` token.
+
+    A token must be valid and, where the route names a user, name the same
+    one. Without a token the route's own user_id (path, else ?user_id=) is
+    trusted as before, unless AUTH_REQUIRED is set.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        claimed = kwargs.get('user_id', request.args.get('user_id', type=int))
+        token = _bearer()
+        if token is None:
+            if current_app.config['AUTH_REQUIRED']:
+                return jsonify({'message': 'Authentication required'}), 401
+            g.user_id = claimed
+            return view(*args, **kwargs)
+        user_id = token_user_id(token)
+        if user_id is None:
+            return jsonify({'message': 'Invalid or expired token'}), 401
+        if claimed is not None and claimed != user_id:
+            return jsonify({'message': 'Forbidden'}), 403
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def require_admin(view):
+    """Only serve requests whose X-Admin-Token header matches ADMIN_TOKEN."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('ADMIN_TOKEN')
+        supplied = request.headers.get('X-Admin-Token', '')
+        if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+            return jsonify({'error': 'Admin token required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,287 @@
+"""Optional write-behind for daily entries and goal completions.
+
+With WRITE_BEHIND on, /data/add and goal completion validate the request,
+put the write on a bounded in-memory queue and hand it to one background
+flusher thread. The flusher takes up to WRITE_BEHIND_BATCH_SIZE queued
+writes (waiting at most WRITE_BEHIND_INTERVAL_MS for more to arrive) and
+applies them in a single transaction: entries through the bulk ingest
+path, completions as one claim UPDATE plus one points UPDATE per user. An
+evening spike then costs one commit per batch instead of one per request.
+
+WRITE_BEHIND_ACK decides what a 2xx means:
+
+    'flushed'  the request waits for its batch to commit (group commit);
+               as durable as before, and other workers see it immediately
+    'queued'   the request is answered (202) as soon as it is queued;
+               writes still queued are lost if the process dies
+
+An entry for a day that a direct write stored first (while the queue was
+full) is skipped at flush time; in 'flushed' mode its request gets a 409,
+in 'queued' mode the skip is only logged. A batch that fails for any
+reason other than a locked database is retried one write at a time, so a
+bad write fails alone rather than taking the rest of its batch with it.
+
+Reads of a user's own data go through `read_your_writes`, which waits
+for that user's queued writes to commit first. The queue is per process,
+so with 'queued' that guarantee holds only for reads served by the same
+worker. When the queue is full, requests fall back to writing directly.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g
+from sqlalchemy import update, func
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Goal, User
+from services.badges import award_crossed
+from services.ingest import upsert_chunk
+from services.leaderboard import record_points
+from services.logs import get_logger
+
+DUPLICATE = object()  # returned when the same write is already queued
+
+log = get_logger('write_behind')
+_writer_lock = threading.Lock()
+
+
+class Write:
+    def __init__(self, kind, user_id, payload):
+        self.kind = kind  # 'entry' or 'complete'
+        self.user_id = user_id
+        self.payload = payload
+        self.done = threading.Event()
+        # For completions: the user's new total, or None if already claimed.
+        # For entries: DUPLICATE if the day was already stored when the batch flushed.
+        self.result = None
+        self.error = None
+
+
+class WriteBehind:
+    def __init__(self, app, max_pending=10000, batch_size=500, interval=0.02, ack='flushed', timeout=10,
+                 attempts=3):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self.ack = ack
+        self.timeout = timeout
+        self.attempts = attempts
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._urgent = threading.Event()
+        self._closing = False
+        self._pending = {}  # user_id -> queued writes not yet committed
+        self._entry_keys = set()  # (user_id, date) of queued entries
+        self._goal_ids = set()  # goals with a queued completion
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_entry(self, record):
+        """Queue a parsed DailyData record; DUPLICATE if that day is already queued, None if full."""
+        key = (record['user_id'], record['date'])
+        with self._lock:
+            if key in self._entry_keys:
+                return DUPLICATE
+            write = self._put(Write('entry', record['user_id'], record))
+            if write is not None:
+                self._entry_keys.add(key)
+            return write
+
+    def complete_goal(self, user_id, goal_id):
+        """Queue a goal completion; DUPLICATE if one is already queued, None if full."""
+        with self._lock:
+            if goal_id in self._goal_ids:
+                return DUPLICATE
+            write = self._put(Write('complete', user_id, goal_id))
+            if write is not None:
+                self._goal_ids.add(goal_id)
+            return write
+
+    def _put(self, write):
+        try:
+            self._queue.put_nowait(write)
+        except queue.Full:
+            return None
+        self._pending[write.user_id] = self._pending.get(write.user_id, 0) + 1
+        return write
+
+    def acknowledge(self, write):
+        """'committed', 'queued' or 'failed', waiting for the commit in 'flushed' mode."""
+        if self.ack == 'flushed':
+            self._urgent.set()
+            if write.done.wait(self.timeout):
+                return 'failed' if write.error else 'committed'
+        return 'queued'
+
+    def wait_for_user(self, user_id):
+        """Block until none of the user's queued writes is still uncommitted."""
+        with self._lock:
+            if not self._pending.get(user_id):
+                return True
+            self._urgent.set()
+            return self._flushed.wait_for(lambda: not self._pending.get(user_id), self.timeout)
+
+    def _run(self):
+        while not self._closing or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = 0 if self._urgent.is_set() or self._closing else deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._urgent.clear()
+            self._flush(batch)
+
+    def _commit(self, writes):
+        """Apply and commit writes in one transaction, retrying on a locked database; the error or None."""
+        error = None
+        for attempt in range(self.attempts):
+            try:
+                _apply(writes)
+                db.session.commit()
+                return None
+            except Exception as e:
+                db.session.rollback()
+                error = e
+                if not _locked(e):
+                    break
+                time.sleep(0.05 * (attempt + 1))
+        return error
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            error = self._commit(batch)
+            # A bad write fails alone instead of taking the rest of its batch with it
+            if error is not None and len(batch) > 1 and not _locked(error):
+                errors = {write: self._commit([write]) for write in batch}
+            else:
+                errors = {write: error for write in batch}
+            db.session.remove()
+
+        failed = [w for w in batch if errors[w] is not None]
+        if failed:
+            log.error('write-behind writes failed', extra={'fields': {
+                'writes': [(w.kind, w.user_id, w.payload, str(errors[w])) for w in failed],
+                'batch': len(batch)}})
+        if self.ack == 'queued':
+            skipped = [w for w in batch if w.kind == 'entry' and w.result is DUPLICATE and errors[w] is None]
+            if skipped:
+                log.warning('write-behind entries skipped, day already stored', extra={'fields': {
+                    'writes': [(w.user_id, w.payload['date'].isoformat()) for w in skipped]}})
+        with self._lock:
+            for write in batch:
+                write.error = errors[write]
+                left = self._pending[write.user_id] - 1
+                if left:
+                    self._pending[write.user_id] = left
+                else:
+                    del self._pending[write.user_id]
+                if write.kind == 'entry':
+                    self._entry_keys.discard((write.user_id, write.payload['date']))
+                else:
+                    self._goal_ids.discard(write.payload)
+                write.done.set()
+            self._flushed.notify_all()
+
+    def close(self):
+        """Flush what is queued and stop the flusher."""
+        self._closing = True
+        self._urgent.set()
+        self._thread.join(self.timeout)
+
+
+def _locked(error):
+    return isinstance(error, OperationalError) and 'database is locked' in str(error)
+
+
+def _apply(batch):
+    for write in batch:
+        write.result = None  # from an earlier, rolled back attempt
+    entries = [w for w in batch if w.kind == 'entry']
+    if entries:
+        # Only the first write for a day counts, as with the direct path
+        skipped = []
+        upsert_chunk([w.payload for w in entries], overwrite=False, skipped=skipped)
+        skipped = set(skipped)
+        for write in entries:
+            if (write.user_id, write.payload['date']) in skipped:
+                write.result = DUPLICATE
+
+    completions = {w.payload: w for w in batch if w.kind == 'complete'}
+    if not completions:
+        return
+    claimed = db.session.execute(
+        update(Goal)
+        .where(Goal.id.in_(completions), Goal.completed.is_(False))
+        .values(completed=True, date_completed=datetime.utcnow())
+        .returning(Goal.id, Goal.user_id, Goal.points)
+    ).all()
+    awards = {}
+    for goal in claimed:
+        points, count = awards.get(goal.user_id, (0, 0))
+        awards[goal.user_id] = (points + (goal.points or 10), count + 1)
+    totals = {}
+    moves = []
+    for user_id, (points, count) in awards.items():
+        after = db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(totalPoints=func.coalesce(User.totalPoints, 0) + points,
+                    goals_completed=func.coalesce(User.goals_completed, 0) + count)
+            .returning(User.totalPoints, User.goals_completed)
+        ).first()
+        if after is None:
+            continue
+        totals[user_id] = after.totalPoints
+        moves.append((after.totalPoints - points, after.totalPoints))
+        award_crossed(user_id,
+                      {'goals': after.goals_completed - count, 'points': after.totalPoints - points},
+                      {'goals': after.goals_completed, 'points': after.totalPoints})
+    record_points(moves)
+    for goal in claimed:
+        completions[goal.id].result = totals.get(goal.user_id)
+
+
+def write_behind():
+    """The app's write-behind queue, or None when WRITE_BEHIND is off."""
+    config = current_app.config
+    if not config.get('WRITE_BEHIND'):
+        return None
+    writer = current_app.extensions.get('write_behind')
+    if writer is None:
+        with _writer_lock:
+            writer = current_app.extensions.get('write_behind')
+            if writer is None:
+                writer = current_app.extensions['write_behind'] = WriteBehind(
+                    current_app._get_current_object(),
+                    max_pending=config.get('WRITE_BEHIND_MAX_PENDING', 10000),
+                    batch_size=config.get('WRITE_BEHIND_BATCH_SIZE', 500),
+                    interval=config.get('WRITE_BEHIND_INTERVAL_MS', 20) / 1000,
+                    ack=config.get('WRITE_BEHIND_ACK', 'flushed'),
+                    timeout=config.get('WRITE_BEHIND_TIMEOUT', 10)
+                )
+    return writer
+
+
+def read_your_writes(view):
+    """Let the caller's queued writes commit before a read of their data (after `authenticate`)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        writer = current_app.extensions.get('write_behind')
+        user_id = g.get('user_id')
+        if writer is not None and user_id is not None:
+            writer.wait_for_user(user_id)
+        return view(*args, **kwargs)
+    return wrapper
@@ -1,7 +1,9 @@
-from app import app
+from app import create_app
 from extensions import db
 from models import Goal
 
+app = create_app()
+
 with app.app_context():
     Goal.query.delete()
     db.session.commit()
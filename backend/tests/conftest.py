@@ -0,0 +1,61 @@
+import pytest
+
+from app import create_app
+from extensions import db
+from models import User
+from services.badges import init_badge_catalog
+from services.llm import StubProvider
+
+
+class CountingStub(StubProvider):
+    """StubProvider that counts the calls reaching it, in place of Gemini."""
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.calls = 0
+
+    def stream(self, prompt, temperature=0.7, top_p=1, chunk_size=40):
+        self.calls += 1
+        return super().stream(prompt, temperature, top_p, chunk_size)
+
+    def generate(self, prompt, temperature=0.7, top_p=1):
+        self.calls += 1
+        return super().generate(prompt, temperature, top_p)
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A file rather than :memory: so threads in a test share one database
+    app = create_app('testing', SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "test.sqlite3"}',
+                     ADVICE_ENGINE='llm', LOG_LEVEL='WARNING')
+    with app.app_context():
+        db.create_all()
+        init_badge_catalog()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def llm(app):
+    provider = app.extensions['llm_provider'] = CountingStub()
+    return provider
+
+
+@pytest.fixture
+def make_user(app):
+    count = [0]
+
+    def make(points=0, location_type='urban'):
+        count[0] += 1
+        user = User(username=f'user{count[0]}@example.com', password='x', full_name='Test User',
+                    location_type=location_type, household_size=2, baseline_footprint=0,
+                    totalPoints=points, goals_completed=0)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+    return make
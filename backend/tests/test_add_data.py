@@ -0,0 +1,38 @@
+import pytest
+
+from extensions import db
+from models import DailyData, EmissionRollup
+
+ENTRY = {'travel': 12, 'food': 3, 'waste': 1, 'electricity': 5}
+
+
+@pytest.fixture(params=[False, True], ids=['direct', 'write-behind'])
+def mode(request, app):
+    app.config['WRITE_BEHIND'] = request.param
+    return request.param
+
+
+@pytest.mark.parametrize('body', [
+    {'travel': 12, 'food': 3, 'waste': 1},
+    dict(ENTRY, food='lots'),
+    dict(ENTRY, waste=None),
+])
+def test_invalid_entries_are_400_in_both_modes(client, make_user, mode, body):
+    user_id = make_user()
+    assert client.post(f'/data/add/{user_id}', json=body).status_code == 400
+    assert not DailyData.query.count()
+
+
+def test_unknown_user_is_404(client, mode):
+    assert client.post('/data/add/999', json=ENTRY).status_code == 404
+    db.session.remove()
+    assert not DailyData.query.count()
+    assert not EmissionRollup.query.count()
+
+
+def test_one_entry_per_day(client, make_user, mode):
+    user_id = make_user()
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 201
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 400
+    db.session.remove()
+    assert DailyData.query.filter_by(user_id=user_id).count() == 1
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from app import create_app
+from extensions import db
+from models import User
+from services.security import issue_token, is_hashed
+
+SIGNUP = {'username': 'ada@example.com', 'password': 'correct horse', 'full_name': 'Ada',
+          'location_type': 'urban', 'household_size': 2}
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_signup_stores_a_hash(client):
+    response = client.post('/auth/signup', json=SIGNUP)
+    assert response.status_code == 201
+    stored = db.session.get(User, response.json['user_id']).password
+    assert is_hashed(stored) and SIGNUP['password'] not in stored
+    assert client.get('/auth/me', headers=bearer(response.json['token'])).json['full_name'] == 'Ada'
+
+
+def test_login_rehashes_a_plaintext_password(client, make_user):
+    user_id = make_user()  # stored password is the plaintext 'x'
+    username = db.session.get(User, user_id).username
+
+    assert client.post('/auth/login', json={'username': username, 'password': 'y'}).status_code == 401
+    assert client.post('/auth/login', json={'username': 'nobody', 'password': 'x'}).status_code == 401
+    assert db.session.get(User, user_id).password == 'x'
+
+    response = client.post('/auth/login', json={'username': username, 'password': 'x'})
+    assert response.status_code == 200 and response.json['user_id'] == user_id
+    db.session.remove()
+    assert is_hashed(db.session.get(User, user_id).password)
+    # And the hash checks out on the next login
+    assert client.post('/auth/login', json={'username': username, 'password': 'x'}).status_code == 200
+
+
+def test_forged_and_expired_tokens_are_refused(app, client, make_user):
+    user_id = make_user()
+    token = issue_token(user_id)
+    forged = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+    assert client.get(f'/goals/{user_id}', headers=bearer(forged)).status_code == 401
+
+    with create_app('testing', SECRET_KEY='someone-else').app_context():
+        foreign = issue_token(user_id)
+    assert client.get(f'/goals/{user_id}', headers=bearer(foreign)).status_code == 401
+
+    app.config['TOKEN_MAX_AGE'] = 1
+    time.sleep(2)
+    assert client.get(f'/goals/{user_id}', headers=bearer(token)).status_code == 401
+
+
+def test_token_for_another_user_is_forbidden(client, make_user):
+    alice, bob = make_user(), make_user()
+    headers = bearer(issue_token(alice))
+    assert client.get(f'/goals/{alice}', headers=headers).status_code == 200
+    assert client.get(f'/goals/{bob}', headers=headers).status_code == 403
+    assert client.get(f'/auth/me?user_id={bob}', headers=headers).status_code == 403
+
+
+def test_auth_required_refuses_callers_without_a_token(app, client, make_user):
+    user_id = make_user()
+    assert client.get(f'/goals/{user_id}').status_code == 200
+    app.config['AUTH_REQUIRED'] = True
+    assert client.get(f'/goals/{user_id}').status_code == 401
+    assert client.get(f'/goals/{user_id}', headers=bearer(issue_token(user_id))).status_code == 200
+
+
+def test_production_refuses_the_fallback_secret_key(monkeypatch):
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app('production', SECRET_KEY='your-secret-key', SQLALCHEMY_DATABASE_URI='sqlite://')
+    app = create_app('production', SECRET_KEY='s3cret', SQLALCHEMY_DATABASE_URI='sqlite://')
+    assert app.config['AUTH_REQUIRED']
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Badge, Goal, UserBadge
+from services.badges import award_crossed, catalog, BadgeCatalog
+
+
+def names(badges):
+    return sorted(b['name'] for b in badges)
+
+
+def test_crossed_takes_thresholds_in_the_half_open_range(app):
+    badges = BadgeCatalog()
+    assert names(badges.crossed({'goals': 0, 'points': 0}, {'goals': 1, 'points': 10})) == ['First Step']
+    assert names(badges.crossed({'goals': 4, 'points': 490}, {'goals': 5, 'points': 760})) == \
+        ['Almost There', 'Rising Star', 'Starter']
+    # Reaching a threshold counts once; starting on it doesn't count again
+    assert badges.crossed({'goals': 5, 'points': 500}, {'goals': 6, 'points': 510}) == []
+
+
+def test_catalog_reloads_after_a_badge_changes(app):
+    before = len(catalog.ensure_loaded().badges)
+    badge = Badge(name='Night Owl', description='Log after midnight', icon='🦉')
+    db.session.add(badge)
+    db.session.commit()
+    assert len(catalog.ensure_loaded().badges) == before + 1
+    assert catalog.by_id[badge.id]['name'] == 'Night Owl'
+
+    badge.icon = '🌙'
+    db.session.commit()
+    assert catalog.ensure_loaded().by_name['Night Owl']['icon'] == '🌙'
+
+
+def test_completions_award_each_badge_once(client, make_user):
+    user_id = make_user(points=480)
+    goals = [Goal(user_id=user_id, title=f'Goal {i}', points=10) for i in range(6)]
+    db.session.add_all(goals)
+    db.session.commit()
+    goal_ids = [g.id for g in goals]
+
+    for goal_id in goal_ids[:2]:
+        assert client.patch(f'/goals/complete/{user_id}/{goal_id}').status_code == 200
+    # Completing the same goal again awards nothing
+    assert client.patch(f'/goals/complete/{user_id}/{goal_ids[0]}').json['message'] == 'Goal already completed'
+    rewards = client.get(f'/rewards/{user_id}').json
+    assert names(rewards['earnedBadges']) == ['First Step', 'Rising Star']
+
+    for goal_id in goal_ids[2:]:
+        client.patch(f'/goals/complete/{user_id}/{goal_id}')
+    rewards = client.get(f'/rewards/{user_id}').json
+    assert names(rewards['earnedBadges']) == ['First Step', 'Rising Star', 'Starter']
+    assert rewards['totalPoints'] == 540
+    assert 'Starter' not in names(rewards['availableBadges'])
+
+
+def test_badges_are_not_awarded_twice(make_user):
+    user_id = make_user()
+    snapshots = ({'goals': 0, 'points': 0}, {'goals': 1, 'points': 10})
+    assert len(award_crossed(user_id, *snapshots)) == 1
+    db.session.commit()
+    # The same crossing again, e.g. replayed after a retry
+    assert award_crossed(user_id, *snapshots) == []
+    db.session.commit()
+    assert UserBadge.query.filter_by(user_id=user_id).count() == 1
+
+    badge_id = UserBadge.query.filter_by(user_id=user_id).one().badge_id
+    db.session.add(UserBadge(user_id=user_id, badge_id=badge_id))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from services.cache import CoalescingCache, MemoryBackend
+from services.ingest import bulk_upsert, iter_json_records
+
+
+def test_hit_skips_compute():
+    cache = CoalescingCache(MemoryBackend(), ttl=60)
+    calls = []
+    assert cache.get_or_compute('k', lambda: calls.append(1) or {'v': 1}) == {'v': 1}
+    assert cache.get_or_compute('k', lambda: calls.append(1) or {'v': 2}) == {'v': 1}
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_share_one_compute():
+    cache = CoalescingCache(MemoryBackend(), ttl=60)
+    calls = []
+    start = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'v': len(calls)}
+
+    def request():
+        start.wait()
+        results.append(cache.get_or_compute('k', compute))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{'v': 1}] * 8
+
+
+def test_errors_are_not_cached():
+    cache = CoalescingCache(MemoryBackend(), ttl=60)
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', fail)
+    assert cache.get_or_compute('k', lambda: {'v': 1}) == {'v': 1}
+
+
+def test_expired_entries_are_recomputed():
+    cache = CoalescingCache(MemoryBackend(), ttl=-1)
+    calls = []
+    cache.get_or_compute('k', lambda: calls.append(1) or {'v': 1})
+    cache.get_or_compute('k', lambda: calls.append(1) or {'v': 1})
+    assert len(calls) == 2
+
+
+def log_days(user_id, days=5):
+    today = date.today()
+    bulk_upsert(iter_json_records([
+        {'user_id': user_id, 'date': (today - timedelta(days=d)).isoformat(),
+         'travel': 10 + d, 'food': 2, 'waste': 1, 'electricity': 3}
+        for d in range(days)
+    ]))
+
+
+def test_recommendations_reuse_one_llm_call(client, llm, make_user):
+    user_id = make_user()
+    log_days(user_id)
+    first = client.get(f'/data/recommendations/{user_id}')
+    second = client.get(f'/data/recommendations/{user_id}')
+    assert first.status_code == second.status_code == 200
+    assert first.json == second.json
+    assert llm.calls == 1
+
+    # The streaming variant is answered from the same cache entry
+    body = client.get(f'/data/recommendations/{user_id}/stream').get_data(as_text=True)
+    assert 'event: done\ndata: {"source": "cache"}' in body
+    assert llm.calls == 1
+
+
+def test_concurrent_recommendations_coalesce(app, llm, make_user):
+    user_id = make_user()
+    log_days(user_id)
+    llm.latency = 0.2
+    start = threading.Barrier(4)
+    statuses = []
+
+    def request():
+        client = app.test_client()
+        start.wait()
+        statuses.append(client.get(f'/data/recommendations/{user_id}').status_code)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses == [200] * 4
+    assert llm.calls == 1
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from services.ingest import bulk_upsert, iter_json_records
+
+
+def log(user_id, days):
+    bulk_upsert(iter_json_records([
+        {'user_id': user_id, 'date': day.isoformat(), 'travel': 10, 'food': 1, 'waste': 1, 'electricity': 1}
+        for day in days
+    ]))
+
+
+def chart(client, user_id, start, end, bucket):
+    response = client.get(f'/data/chart/{user_id}?start={start}&end={end}&bucket={bucket}')
+    assert response.status_code == 200
+    return response.json
+
+
+def test_buckets_are_labelled_by_their_start_and_gaps_are_zero(client, make_user):
+    user_id = make_user()
+    # Wed 2024-01-10 .. Tue 2024-01-16, nothing in February, then 2024-03-04..05 and 2025-01-02
+    days = [date(2024, 1, 10) + timedelta(days=d) for d in range(7)]
+    days += [date(2024, 3, 4), date(2024, 3, 5), date(2025, 1, 2)]
+    log(user_id, days)
+    start, end = date(2024, 1, 10), date(2025, 1, 2)
+
+    weeks = chart(client, user_id, start, end, 'week')
+    assert weeks['dates'][:4] == ['2024-01-08', '2024-01-15', '2024-01-22', '2024-01-29']
+    assert weeks['entries'][:4] == [5, 2, 0, 0]
+    assert weeks['dates'][-1] == '2024-12-30'
+    assert len(weeks['dates']) == 52
+
+    months = chart(client, user_id, start, end, 'month')
+    assert months['dates'] == [f'2024-{m:02d}-01' for m in range(1, 13)] + ['2025-01-01']
+    assert months['entries'] == [7, 0, 2] + [0] * 9 + [1]
+    assert months['travel'][1] == months['total'][1] == 0
+
+    years = chart(client, user_id, start, end, 'year')
+    assert years['dates'] == ['2024-01-01', '2025-01-01']
+    assert years['entries'] == [9, 1]
+    assert round(sum(years['total']), 3) == round(sum(months['total']), 3) == round(sum(weeks['total']), 3)
+
+    one_day = chart(client, user_id, date(2024, 2, 28), date(2024, 3, 4), 'day')
+    assert one_day['dates'] == ['2024-02-28', '2024-02-29', '2024-03-01', '2024-03-02', '2024-03-03', '2024-03-04']
+    assert one_day['entries'] == [0, 0, 0, 0, 0, 1]
+
+
+def test_bad_ranges_are_rejected(client, make_user):
+    user_id = make_user()
+    assert client.get(f'/data/chart/{user_id}?bucket=decade').status_code == 400
+    assert client.get(f'/data/chart/{user_id}?start=2024-02-30').status_code == 400
+    assert client.get(f'/data/chart/{user_id}?start=2024-03-01&end=2024-02-01').status_code == 400
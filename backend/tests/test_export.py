@@ -0,0 +1,63 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, timedelta
+
+from extensions import db
+from models import Goal
+from services.ingest import bulk_upsert, iter_json_records
+
+ADMIN = {'X-Admin-Token': 'admin'}
+
+
+def seed(make_user, users=3, days=7):
+    user_ids = [make_user() for _ in range(users)]
+    start = date(2024, 1, 1)
+    bulk_upsert(iter_json_records([
+        {'user_id': u, 'date': (start + timedelta(days=d)).isoformat(),
+         'travel': d, 'food': 1, 'waste': 1, 'electricity': 1}
+        for u in user_ids for d in range(days)
+    ]))
+    db.session.add_all(Goal(user_id=u, title=f'Goal "{i}", quoted', points=10) for u in user_ids for i in range(4))
+    db.session.commit()
+    return user_ids
+
+
+def test_admin_export_needs_the_token(app, client, make_user):
+    seed(make_user)
+    assert client.get('/export/all/goals').status_code == 403  # no ADMIN_TOKEN configured
+    app.config['ADMIN_TOKEN'] = 'admin'
+    assert client.get('/export/all/goals').status_code == 403
+    assert client.get('/export/all/goals', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/export/all/goals', headers=ADMIN).status_code == 200
+
+
+def test_gzip_ndjson_round_trip_across_batches(app, client, make_user):
+    app.config.update(ADMIN_TOKEN='admin', EXPORT_BATCH_SIZE=5)
+    user_ids = seed(make_user)
+    response = client.get('/export/all/daily_data?format=ndjson',
+                          headers=dict(ADMIN, **{'Accept-Encoding': 'gzip'}))
+    assert response.status_code == 200 and response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=all-daily_data.ndjson'
+
+    rows = [json.loads(line) for line in gzip.decompress(response.get_data()).decode().splitlines()]
+    assert len(rows) == 3 * 7
+    assert [r['id'] for r in rows] == sorted(r['id'] for r in rows)
+    assert {r['user_id'] for r in rows} == set(user_ids)
+    assert rows[0]['date'] == '2024-01-01'
+
+
+def test_user_csv_export(client, make_user):
+    user_ids = seed(make_user)
+    response = client.get(f'/export/{user_ids[1]}/goals')
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 4
+    assert {r['user_id'] for r in rows} == {str(user_ids[1])}
+    assert rows[0]['title'] == 'Goal "0", quoted'
+
+    assert client.get(f'/export/{user_ids[1]}/passwords').status_code == 404
+    assert client.get(f'/export/{user_ids[1]}/goals?format=xml').status_code == 400
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Goal
+
+
+def add_goals(user_id, count, start=datetime(2024, 5, 1)):
+    # Several goals share each generated_at, as a generation batch does
+    goals = [Goal(user_id=user_id, title=f'Goal {i}', category=('food', 'travel')[i % 2], points=10,
+                  generated_at=start + timedelta(hours=i // 3)) for i in range(count)]
+    db.session.add_all(goals)
+    db.session.commit()
+    return [goal.id for goal in goals]
+
+
+def test_pages_cover_every_goal_once(client, make_user):
+    user_id = make_user()
+    goal_ids = add_goals(user_id, 23)
+    add_goals(make_user(), 5)  # someone else's
+
+    for query in ('limit=4', 'limit=1&category=food', 'limit=100&fields=id,title'):
+        seen, cursor = [], None
+        while True:
+            url = f'/goals/{user_id}?{query}' + (f'&cursor={cursor}' if cursor else '')
+            body = client.get(url).json
+            seen += [goal['id'] for goal in body['goals']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        expected = goal_ids if 'category' not in query else goal_ids[::2]
+        assert sorted(seen) == sorted(expected)
+        assert len(seen) == len(set(seen))
+    assert set(body['goals'][0]) == {'id', 'title'}
+
+
+def test_bad_parameters_are_rejected(client, make_user):
+    user_id = make_user()
+    add_goals(user_id, 3)
+    assert client.get(f'/goals/{user_id}?cursor=not-a-cursor').status_code == 400
+    assert client.get(f'/goals/{user_id}?cursor=2024-13-01T00:00:00:5').status_code == 400
+    assert client.get(f'/goals/{user_id}?fields=id,secret').status_code == 400
+    assert client.get(f'/goals/{user_id}?status=maybe').status_code == 400
+
+
+def test_matching_etag_answers_304(client, make_user):
+    user_id = make_user()
+    add_goals(user_id, 3)
+    first = client.get(f'/goals/{user_id}')
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get(f'/goals/{user_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and not again.data
+    # The same goals under another query have their own tag
+    assert client.get(f'/goals/{user_id}?limit=2', headers={'If-None-Match': first.headers['ETag']}) \
+        .status_code == 200
+
+
+def test_etag_changes_on_every_write(client, make_user):
+    user_id = make_user()
+    goal_ids = add_goals(user_id, 4)
+
+    def etag():
+        return client.get(f'/goals/{user_id}').headers['ETag']
+
+    tags = [etag()]
+    assert client.patch(f'/goals/complete/{user_id}/{goal_ids[0]}').status_code == 200
+    tags.append(etag())
+
+    # Replace the newest goal: SQLite gives the new row the deleted one's id
+    db.session.delete(db.session.get(Goal, goal_ids[-1]))
+    db.session.commit()
+    tags.append(etag())
+    replacement = Goal(user_id=user_id, title='Different goal', points=10)
+    db.session.add(replacement)
+    db.session.commit()
+    assert replacement.id == goal_ids[-1]
+    tags.append(etag())
+
+    assert client.post(f'/goals/{user_id}', json={'title': 'Added', 'category': 'food'}).status_code == 201
+    tags.append(etag())
+    assert len(set(tags)) == len(tags)
+
+    stale = client.get(f'/goals/{user_id}', headers={'If-None-Match': tags[2]})
+    assert stale.status_code == 200
+    assert 'Different goal' in [goal['title'] for goal in stale.json]
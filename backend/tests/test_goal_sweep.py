@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+import pytest
+
+from extensions import db
+from models import Goal, GoalSweep, User
+from services.goal_sweep import run_sweep
+from services.ingest import bulk_upsert, iter_json_records
+
+
+class Interrupted(Exception):
+    pass
+
+
+def users_with_data(make_user, count):
+    user_ids = [make_user(points=100) for _ in range(count)]
+    today = date.today()
+    bulk_upsert(iter_json_records([
+        {'user_id': u, 'date': (today - timedelta(days=d)).isoformat(),
+         'travel': 10, 'food': 2, 'waste': 1, 'electricity': 3}
+        for u in user_ids for d in range(3)
+    ]))
+    return user_ids
+
+
+def goals_per_user():
+    db.session.remove()
+    return dict(db.session.query(Goal.user_id, db.func.count(Goal.id)).group_by(Goal.user_id).all())
+
+
+def test_interrupted_sweep_resumes_from_its_checkpoint(make_user, llm):
+    user_ids = users_with_data(make_user, 7)
+    make_user()  # no data: skipped
+
+    def stop_after_two_batches(sweep):
+        if sweep.last_user_id >= user_ids[3]:
+            raise Interrupted
+    with pytest.raises(Interrupted):
+        run_sweep(batch_size=2, progress=stop_after_two_batches)
+    db.session.rollback()
+    checkpoint = GoalSweep.query.one()
+    assert checkpoint.finished_at is None and checkpoint.last_user_id == user_ids[3]
+    assert set(goals_per_user()) == set(user_ids[:4])
+
+    sweep = run_sweep(batch_size=2)
+    assert sweep.id == checkpoint.id and sweep.finished_at is not None
+    assert sweep.users == 7 and sweep.skipped == 1
+    counts = goals_per_user()
+    assert set(counts) == set(user_ids)
+    assert len(set(counts.values())) == 1  # nobody got a second set
+    # Everyone lands in one summary bucket: one LLM call per run, the resumed one included
+    assert llm.calls == 2
+
+
+def test_second_sweep_changes_nothing(make_user, llm):
+    user_ids = users_with_data(make_user, 3)
+    first = run_sweep(batch_size=2)
+    counts = goals_per_user()
+    totals = {u: (p, c) for u, p, c in db.session.query(User.id, User.totalPoints, User.goals_completed)}
+
+    second = run_sweep(batch_size=2)
+    assert second.id != first.id
+    assert second.users == 0 and second.goals == 0
+    assert goals_per_user() == counts
+    assert {u: (p, c) for u, p, c in db.session.query(User.id, User.totalPoints, User.goals_completed)} == totals
+    assert all(totals[u] == (100, 0) for u in user_ids)
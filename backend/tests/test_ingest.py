@@ -0,0 +1,35 @@
+from extensions import db
+from models import DailyData, EmissionRollup
+
+ADMIN = {'X-Admin-Token': 'admin'}
+
+
+def record(user_id, day, travel=10):
+    return {'user_id': user_id, 'date': day, 'travel': travel, 'food': 2, 'waste': 1, 'electricity': 3}
+
+
+def test_unknown_users_are_rejected(app, client, make_user):
+    app.config['ADMIN_TOKEN'] = 'admin'
+    user_id = make_user()
+    records = [record(user_id, '2024-03-01'), record(user_id, '2024-03-02'), record(12345, '2024-03-01')]
+
+    assert client.post('/data/bulk', json=records).status_code == 403
+    response = client.post('/data/bulk?chunk_size=2', json=records, headers=ADMIN)
+    assert response.status_code == 400
+    assert '12345' in response.json['message']
+    # The chunk before the bad record stays committed; nothing is written for 12345
+    assert response.json['committed'] == {'inserted': 2, 'updated': 0}
+    db.session.remove()
+    assert not DailyData.query.filter_by(user_id=12345).count()
+    assert not EmissionRollup.query.filter_by(user_id=12345).count()
+
+
+def test_bulk_overwrites_existing_days(app, client, make_user):
+    app.config['ADMIN_TOKEN'] = 'admin'
+    user_id = make_user()
+    first = client.post('/data/bulk', json=[record(user_id, '2024-03-01')], headers=ADMIN)
+    assert first.json == {'message': 'Bulk data ingested', 'inserted': 1, 'updated': 0}
+    lines = '\n'.join(f'{{"user_id": {user_id}, "date": "2024-03-0{d}", "travel": 20, "food": 2, '
+                      f'"waste": 1, "electricity": 3}}' for d in (1, 2))
+    second = client.post('/data/bulk', data=lines, content_type='application/x-ndjson', headers=ADMIN)
+    assert second.json == {'message': 'Bulk data ingested', 'inserted': 1, 'updated': 1}
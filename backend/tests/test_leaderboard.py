@@ -0,0 +1,51 @@
+from extensions import db
+from models import Goal, User
+from services import leaderboard
+
+
+def expected_rank(points):
+    return db.session.query(User).filter(User.totalPoints > points).count() + 1
+
+
+def all_pages(limit):
+    entries, cursor = leaderboard.page(limit)
+    while cursor:
+        more, cursor = leaderboard.page(limit, cursor)
+        entries += more
+    return entries
+
+
+def test_pages_rank_ties_alike(make_user):
+    # Tie groups of several sizes, some of them split across page boundaries
+    for points in [90, 70, 70, 70, 50, 50, 30, 30, 30, 30, 10, 0, 0]:
+        make_user(points)
+    leaderboard.rebuild_points_tally()
+
+    for limit in (1, 2, 3, 5, 100):
+        entries = all_pages(limit)
+        assert [e['points'] for e in entries] == [90, 70, 70, 70, 50, 50, 30, 30, 30, 30, 10]
+        assert [e['rank'] for e in entries] == [1, 2, 2, 2, 5, 5, 7, 7, 7, 7, 11]
+    assert leaderboard.rank_of(0) == 12
+    assert leaderboard.rank_of(1000) == 1
+
+
+def test_completions_keep_ranks_current(client, make_user):
+    user_ids = [make_user(points) for points in (40, 40, 20, 0)]
+    leaderboard.rebuild_points_tally()
+    goals = [Goal(user_id=u, title='Goal', points=p) for u, p in zip(user_ids, (10, 20, 20, 30))]
+    db.session.add_all(goals)
+    db.session.commit()
+    goal_ids = [(g.user_id, g.id) for g in goals]
+
+    for user_id, goal_id in goal_ids:
+        assert client.patch(f'/goals/complete/{user_id}/{goal_id}').status_code == 200
+    db.session.remove()
+
+    # Now 50, 60, 40, 30
+    for user_id in user_ids:
+        me = leaderboard.my_rank(user_id)
+        assert me['rank'] == expected_rank(me['points'])
+    assert [e['rank'] for e in all_pages(2)] == [1, 2, 3, 4]
+
+    response = client.get(f'/rewards/leaderboard?user_id={user_ids[3]}&limit=2')
+    assert response.json['me'] == {'rank': 4, 'points': 30}
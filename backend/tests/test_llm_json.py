@@ -0,0 +1,77 @@
+import pytest
+
+from services.llm_json import JsonExtractor, extract_json, validate, GOAL, RECOMMENDATIONS, SchemaError
+
+GOALS = '[{"title": "Walk to work", "points": 50}, {"title": "Compost", "category": "waste"}]'
+RECOMMENDATION = ('{"priority_actions": [{"title": "Take the bus", "impact": "High"}], '
+                  '"recommendations": [{"category": "Food & Diet", "tips": ["Eat [more] plants"]}]}')
+
+
+def feed(extractor, text, size):
+    elements = []
+    for i in range(0, len(text), size):
+        elements += extractor.feed(text[i:i + size])
+    return elements
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1000])
+def test_prose_wrapped_array(size):
+    extractor = JsonExtractor(list, schema=GOAL)
+    elements = feed(extractor, f'Sure! Here you go: {GOALS} Let me know if you need more.', size)
+    assert extractor.complete
+    assert [e['title'] for e in elements] == ['Walk to work', 'Compost']
+    assert extractor.value == elements
+
+
+@pytest.mark.parametrize('size', [1, 5, 1000])
+def test_code_fenced_object(size):
+    text = f'```json\n{RECOMMENDATION}\n```\nAnything after the fence {{"is": "ignored"}}'
+    value = extract_json(text[i:i + size] for i in range(0, len(text), size))
+    assert value['priority_actions'][0]['title'] == 'Take the bus'
+    assert validate(value, RECOMMENDATIONS)['priority_actions'][0]['effort'] == 'Medium'
+
+
+def test_stray_brackets_before_the_value_are_skipped():
+    extractor = JsonExtractor(list, schema=GOAL)
+    elements = extractor.feed(f'Here are [3] goals (see [1]): {GOALS}')
+    assert extractor.complete
+    assert extractor.value[0]['title'] == 'Walk to work'
+    # Elements of the rejected [3] were handed back too; validation drops them
+    assert [e for e in elements if isinstance(e, dict)] == extractor.value
+
+
+def test_value_of_the_wrong_type_is_skipped():
+    assert extract_json(['Options: ["a", "b"] ', RECOMMENDATION])['recommendations'][0]['tips'] == \
+        ['Eat [more] plants']
+
+
+def test_nested_brackets_inside_elements():
+    extractor = JsonExtractor(list, schema=GOAL)
+    elements = extractor.feed('[{"title": "a [b] {c}", "tags": [[1], {"x": [2]}]}, {"title": "d"}]')
+    assert extractor.complete
+    assert [e['title'] for e in elements] == ['a [b] {c}', 'd']
+
+
+def test_truncated_reply():
+    extractor = JsonExtractor(list, schema=GOAL)
+    elements = extractor.feed('[{"title": "kept"}, {"title": "cut o')
+    assert not extractor.complete
+    assert elements == [{'title': 'kept'}]
+    with pytest.raises(SchemaError) as error:
+        extract_json(['{"priority_actions": [{"title": "cut o'])
+    assert error.value.raw.startswith('{"priority_actions"')
+
+
+def test_keyed_arrays_are_handed_back_per_element():
+    extractor = JsonExtractor(keys=('priority_actions', 'recommendations'), schema=RECOMMENDATIONS)
+    elements = feed(extractor, f'Note [1]: {RECOMMENDATION}', 4)
+    assert extractor.complete
+    assert [key for key, _ in elements] == ['priority_actions', 'recommendations']
+    assert elements[1][1]['tips'] == ['Eat [more] plants']
+
+
+def test_goal_schema_cleans_values():
+    goal = validate({'title': '  Walk  ', 'points': '99'}, GOAL)
+    assert goal == {'title': 'Walk', 'description': '', 'category': 'general', 'points': 30}
+    with pytest.raises(SchemaError):
+        validate({'description': 'no title'}, GOAL)
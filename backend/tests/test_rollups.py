@@ -0,0 +1,55 @@
+import random
+from datetime import date, timedelta
+
+from extensions import db
+from models import EmissionRollup
+from services.ingest import bulk_upsert, iter_json_records
+from services.rollups import rebuild_rollups, window_totals, CATEGORIES
+
+
+def snapshot():
+    return {
+        (r.user_id, r.period, r.period_start): (tuple(round(getattr(r, c), 6) for c in CATEGORIES), r.entries)
+        for r in EmissionRollup.query
+    }
+
+
+def records(rng, user_ids, start, days):
+    return [
+        {'user_id': u, 'date': (start + timedelta(days=rng.randrange(days))).isoformat(),
+         **{c: rng.randint(0, 40) for c in CATEGORIES}}
+        for u in user_ids for _ in range(days // 2)
+    ]
+
+
+def test_deltas_match_a_rebuild(client, make_user):
+    rng = random.Random(7)
+    user_ids = [make_user() for _ in range(3)]
+    start = date(2024, 1, 20)  # spans week and month boundaries
+
+    bulk_upsert(iter_json_records(records(rng, user_ids, start, 60)), chunk_size=17)
+    # Overwrites: the same days again with new values
+    bulk_upsert(iter_json_records(records(rng, user_ids, start, 60)), chunk_size=5)
+    # And today's entries through the route
+    for u in user_ids:
+        assert client.post(f'/data/add/{u}', json={'travel': 5, 'food': 1, 'waste': 2, 'electricity': 3}) \
+            .status_code == 201
+
+    incremental = snapshot()
+    assert incremental
+    db.session.remove()
+    rebuild_rollups()
+    assert snapshot() == incremental
+
+
+def test_window_totals_add_up_the_days(make_user):
+    user_id = make_user()
+    start = date(2024, 2, 26)
+    bulk_upsert(iter_json_records([
+        {'user_id': user_id, 'date': (start + timedelta(days=d)).isoformat(),
+         'travel': 10, 'food': 1, 'waste': 1, 'electricity': 1}
+        for d in range(40)
+    ]))
+    totals = window_totals(user_id, start + timedelta(days=3), start + timedelta(days=36))
+    assert totals['entries'] == 34
+    assert round(totals['travel'], 6) == round(34 * window_totals(user_id, start, start)['travel'], 6)
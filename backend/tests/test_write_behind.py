@@ -0,0 +1,94 @@
+import queue
+from datetime import date
+
+import pytest
+
+from extensions import db
+from models import DailyData, Goal
+from services.ingest import bulk_upsert, parse_record
+from services.write_behind import write_behind, DUPLICATE
+
+ENTRY = {'travel': 12, 'food': 3, 'waste': 1, 'electricity': 5}
+
+
+@pytest.fixture
+def writer(app):
+    def start(ack):
+        # A long batch window, so writes sit in the queue until something needs them
+        app.config.update(WRITE_BEHIND=True, WRITE_BEHIND_ACK=ack, WRITE_BEHIND_INTERVAL_MS=300)
+        return write_behind()
+    yield start
+    if 'write_behind' in app.extensions:
+        app.extensions.pop('write_behind').close()
+
+
+def entries(user_id):
+    db.session.remove()
+    return DailyData.query.filter_by(user_id=user_id).count()
+
+
+def test_flushed_ack_answers_after_the_commit(client, make_user, writer):
+    writer('flushed')
+    user_id = make_user()
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 201
+    assert entries(user_id) == 1
+
+
+def test_queued_ack_then_read_your_writes(client, make_user, writer):
+    writer('queued')
+    user_id = make_user(points=5)
+    goal = Goal(user_id=user_id, title='Goal', points=20)
+    db.session.add(goal)
+    db.session.commit()
+    goal_id = goal.id
+
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 202
+    assert client.patch(f'/goals/complete/{user_id}/{goal_id}').status_code == 202
+    # The read waits for this user's queued writes
+    assert client.get(f'/auth/me?user_id={user_id}').json['totalPoints'] == 25
+    assert entries(user_id) == 1
+
+
+def test_duplicate_day_refused_while_queued(client, make_user, writer):
+    writer('queued')
+    user_id = make_user()
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 202
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 400
+    client.get(f'/auth/me?user_id={user_id}')
+    assert entries(user_id) == 1
+
+
+def test_full_queue_falls_back_to_a_direct_write(client, make_user, writer, monkeypatch):
+    queue_ = writer('queued')._queue
+
+    def full(item):
+        raise queue.Full
+    monkeypatch.setattr(queue_, 'put_nowait', full)
+    user_id = make_user()
+    assert client.post(f'/data/add/{user_id}', json=ENTRY).status_code == 201
+    assert entries(user_id) == 1
+
+
+def test_day_stored_before_the_flush_is_reported(make_user, writer):
+    queue_writer = writer('flushed')
+    user_id = make_user()
+    record = parse_record(dict(ENTRY, user_id=user_id, date=date.today().isoformat()))
+    # A direct write for the same day wins the race
+    bulk_upsert([dict(record, travel=1)])
+    write = queue_writer.add_entry(record)
+    assert queue_writer.acknowledge(write) == 'committed'
+    assert write.result is DUPLICATE
+    db.session.remove()
+    assert DailyData.query.filter_by(user_id=user_id).one().travel < record['travel']
+
+
+def test_a_bad_write_fails_alone(make_user, writer):
+    queue_writer = writer('queued')
+    user_id = make_user()
+    today = date.today().isoformat()
+    good = queue_writer.add_entry(parse_record(dict(ENTRY, user_id=user_id, date=today)))
+    bad = queue_writer.add_entry(parse_record(dict(ENTRY, user_id=999, date=today)))
+    assert queue_writer.wait_for_user(user_id) and queue_writer.wait_for_user(999)
+    assert good.error is None and good.result is None
+    assert bad.error is not None
+    assert entries(user_id) == 1
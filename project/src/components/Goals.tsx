@@ -22,16 +22,26 @@ const Goals: React.FC = () => {
   const fetchGoals = async () => {
     try {
       // Step 1: Trigger goal generation (if not done recently)
-      await axios.post(`http://localhost:5000/generate_goals/${userId}`);
-
-      // Step 2: Get all goals
-      const res = await axios.get(`http://localhost:5000/goals/${userId}`);
-      const allGoals: Goal[] = res.data;
-      console.log(allGoals)
-      // Optional: Only show incomplete goals
-      const incompleteGoals = allGoals.filter(goal => !goal.completed);
-
-      setGoals(incompleteGoals); // or `setGoals(allGoals)` if you want both
+      const gen = await axios.post(`http://localhost:5000/generate_goals/${userId}`, null, {
+        validateStatus: (status) => status < 500,
+      });
+
+      // Generation runs as a background job; poll until it finishes
+      if (gen.status === 202) {
+        for (let attempt = 0; attempt < 60; attempt++) {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          const job = await axios.get(`http://localhost:5000${gen.data.status_url}`);
+          if (job.data.status === 'done' || job.data.status === 'failed') break;
+        }
+      }
+
+      // Step 2: Get the newest incomplete goals (filtered and paged server-side)
+      const res = await axios.get(`http://localhost:5000/goals/${userId}`, {
+        params: { status: 'pending', limit: 100 },
+      });
+      const incompleteGoals: Goal[] = res.data.goals;
+
+      setGoals(incompleteGoals);
     } catch (err) {
       console.error('Failed to load goals', err);
     } finally {
@@ -127,7 +127,27 @@ const Recommendations: React.FC = () => {
       }
     };
 
-    fetchRecommendations();
+    // Actions and tips show up one by one as the model writes them
+    const source = new EventSource(`http://localhost:5000/data/recommendations/${userId}/stream`);
+    let received = false;
+    source.addEventListener('action', (e) => {
+      received = true;
+      const action = JSON.parse((e as MessageEvent).data);
+      setPriorityActions((prev) => [...prev, action]);
+    });
+    source.addEventListener('tips', (e) => {
+      received = true;
+      const category = JSON.parse((e as MessageEvent).data);
+      setRecommendations((prev) => [...prev, category]);
+    });
+    source.addEventListener('done', () => source.close());
+    source.onerror = () => {
+      // Closed by the server or never opened: use the one-shot endpoint if nothing arrived
+      source.close();
+      if (!received) fetchRecommendations();
+    };
+
+    return () => source.close();
   }, []);
 
   return (
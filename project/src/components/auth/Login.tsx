@@ -30,6 +30,7 @@ try {
   if (res.ok) {
     localStorage.setItem('isLoggedIn', 'true');
     localStorage.setItem('user_id',data.user_id);
+    localStorage.setItem('token', data.token);
     navigate('/dashboard');
   } else {
     setError(data.message || 'Invalid credentials');
@@ -1,8 +1,18 @@
 import { StrictMode } from 'react';
 import { createRoot } from 'react-dom/client';
+import axios from 'axios';
 import App from './App.tsx';
 import './index.css';
 
+// Identify the user to the API with the session token from login/signup
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem('token');
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`;
+  }
+  return config;
+});
+
 createRoot(document.getElementById('root')!).render(
   <StrictMode>
     <App />